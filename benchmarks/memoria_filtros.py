@@ -0,0 +1,230 @@
+"""
+Pico de memoria (RSS) de la capa de filtros del cubo: `filtrar_origen`,
+`total` y `conteo` por origen y año sobre las tablas de hechos y edades, con
+la versión actual de utils.agregados ("vistas": rebanadas sin copia y
+máscaras en caché) y con la anterior ("copias": una subtabla filtrada por
+consulta).
+
+Cada variante corre en un proceso propio sobre el mismo cubo sintético. Tras
+construir el cubo se devuelve la memoria libre al sistema y se reinicia el
+pico de RSS del proceso (Linux, /proc/self/clear_refs), de modo que se mide
+solo lo que agregan las consultas.
+
+Uso, desde la raíz del repositorio:
+
+    python -m benchmarks.memoria_filtros [--filas 2000000] [--repeticiones 3]
+"""
+
+import argparse
+import ctypes
+import gc
+import json
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from proyectos.conflicto_armado import preparar_datos
+from utils import agregados
+from utils.agregados import HECHO_DESPLAZAMIENTO, agregar_bloque, indexar
+
+ORIGENES = ["INTERMUNICIPAL", "INTRAURBANO"]
+HECHOS = [
+    HECHO_DESPLAZAMIENTO,
+    "Homicidio",
+    "Amenaza",
+    "Desaparición forzada",
+    "Secuestro",
+]
+TABLAS_CONSULTADAS = ["hechos", "declaraciones", "edades"]
+
+
+def _sesgado(rng, valores, filas, exponente, peso_nulo):
+    # Valores con frecuencias desiguales y una fracción de nulos
+    pesos = np.r_[np.arange(1, len(valores) + 1) ** exponente, [peso_nulo]]
+    return rng.choice(valores + [None], filas, p=pesos / pesos.sum())
+
+
+def generar_datos(filas, semilla=0):
+    """DataFrame con las columnas del CSV de conflicto armado"""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.Timestamp("2023-06-01") + pd.to_timedelta(
+        rng.integers(0, 900, filas), unit="D"
+    )
+    responsables = [f"Grupo {i}" for i in range(40)]
+    return pd.DataFrame(
+        {
+            "id_atencion": rng.integers(0, filas // 3 + 1, filas),
+            "documento_anonimizado": np.where(
+                rng.random(filas) < 0.05, None, np.arange(filas).astype(str)
+            ),
+            "fecha_declaracion": fechas.strftime("%Y-%m-%d"),
+            "origen_hecho": rng.choice(ORIGENES, filas),
+            "hecho_victimizante": rng.choice(
+                HECHOS, filas, p=[0.5, 0.2, 0.2, 0.05, 0.05]
+            ),
+            "presunto_responsable": _sesgado(rng, responsables, filas, 1.5, 50),
+            "genero": rng.choice(["Hombre", "Mujer", "LGBTI"], filas),
+            "edad": np.where(
+                rng.random(filas) < 0.1, np.nan, rng.integers(0, 95, filas)
+            ),
+            "enfoque_diferencial": rng.choice(
+                ["Ninguno", "Afro", "Indígena", "Discapacidad"], filas
+            ),
+            "municipio_procede": _sesgado(
+                rng, [f"Mun {i}" for i in range(120)], filas, 2.0, 1e3
+            ),
+            "barrio_procede": _sesgado(
+                rng, [f"Barrio {i}" for i in range(2000)], filas, 2.0, 1e5
+            ),
+        }
+    )
+
+
+# Capa de filtros anterior: cada consulta filtra una subtabla (una copia) y
+# filtrar_origen concatena un tramo por año
+def _filtrar_copia(tabla, **filtros):
+    if not filtros:
+        return tabla
+    mascara = np.ones(len(tabla), dtype=bool)
+    for columna, valor in filtros.items():
+        mascara &= (tabla[columna] == valor).to_numpy(dtype=bool, na_value=False)
+    return tabla[mascara]
+
+
+def _filtrar_origen_copia(cubo, origen):
+    filtrado = dict(cubo)
+    for nombre in TABLAS_CONSULTADAS:
+        partes = [
+            cubo[nombre].iloc[desde:hasta]
+            for (o, _), (desde, hasta) in sorted(cubo["indice"][nombre].items())
+            if o == origen
+        ]
+        filtrado[nombre] = pd.concat(partes, ignore_index=True)
+    return filtrado
+
+
+def _total_copia(tabla, medida="personas", **filtros):
+    return int(_filtrar_copia(tabla, **filtros)[medida].sum())
+
+
+def _conteo_copia(tabla, por, medida="personas", **filtros):
+    return _filtrar_copia(tabla, **filtros).groupby(por, observed=True)[medida].sum()
+
+
+VARIANTES = {
+    "copias": SimpleNamespace(
+        filtrar_origen=_filtrar_origen_copia,
+        total=_total_copia,
+        conteo=_conteo_copia,
+    ),
+    "vistas": agregados,
+}
+
+
+def consultar(cubo, capa, repeticiones):
+    """Las consultas de los análisis por origen y año, `repeticiones` veces"""
+    for _ in range(repeticiones):
+        for origen in ORIGENES:
+            filtrado = capa.filtrar_origen(cubo, origen)
+            hechos = filtrado["hechos"]
+            for ano in agregados.anos(cubo):
+                capa.total(hechos, ano_declara=ano)
+                capa.total(
+                    hechos, ano_declara=ano, hecho_victimizante=HECHO_DESPLAZAMIENTO
+                )
+                capa.conteo(hechos, "ubicacion", ano_declara=ano)
+                capa.conteo(hechos, "hecho_victimizante", ano_declara=ano)
+                capa.conteo(
+                    hechos,
+                    "presunto_responsable",
+                    ano_declara=ano,
+                    hecho_victimizante=HECHO_DESPLAZAMIENTO,
+                )
+                capa.conteo(filtrado["edades"], "edad", ano_declara=ano)
+
+
+def _memoria_mb(campo):
+    # Campo de /proc/self/status (VmRSS, VmHWM) en MB
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith(campo + ":"):
+                return int(linea.split()[1]) / 1024
+    raise KeyError(campo)
+
+
+def _reiniciar_pico():
+    # Se devuelve al sistema la memoria liberada tras construir el cubo (glibc);
+    # si no, las consultas la reutilizan sin que se note en el RSS
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    # Desde Linux 4.0, escribir 5 en clear_refs reinicia VmHWM al RSS actual
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+
+
+def medir_variante(variante, filas, repeticiones):
+    """Pico de RSS y tiempo de las consultas de una variante (en este proceso)"""
+    cubo = indexar(agregar_bloque(preparar_datos(generar_datos(filas))))
+    _reiniciar_pico()
+    base = _memoria_mb("VmRSS")
+    inicio = time.perf_counter()
+    consultar(cubo, VARIANTES[variante], repeticiones)
+    segundos = time.perf_counter() - inicio
+    pico = _memoria_mb("VmHWM")
+    return {
+        "variante": variante,
+        "celdas_hechos": len(cubo["hechos"]),
+        "rss_base_mb": base,
+        "rss_pico_mb": pico,
+        "segundos": segundos,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=2_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--variante", choices=VARIANTES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variante:
+        resultado = medir_variante(args.variante, args.filas, args.repeticiones)
+        print(json.dumps(resultado))
+        return
+
+    print(f"filas: {args.filas:,}  repeticiones: {args.repeticiones}")
+    for variante in VARIANTES:
+        salida = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.memoria_filtros",
+                "--variante",
+                variante,
+                "--filas",
+                str(args.filas),
+                "--repeticiones",
+                str(args.repeticiones),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(
+            f"{variante}: RSS tras el cubo {r['rss_base_mb']:.1f} MB, "
+            f"pico en consultas {r['rss_pico_mb']:.1f} MB "
+            f"(+{r['rss_pico_mb'] - r['rss_base_mb']:.1f} MB), "
+            f"{r['segundos']:.2f} s  [{r['celdas_hechos']:,} celdas en hechos]"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compara parse_time_to_minutes (fila a fila) con parse_time_column_to_minutes
+sobre una columna sintética de tiempos HH:MM:SS con nulos y valores mal
+formados.
+
+Uso, desde la raíz del repositorio:
+
+    python -m benchmarks.tiempos [--filas 1000000] [--repeticiones 3]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from proyectos.analisis_atenciones import (
+    parse_time_column_to_minutes,
+    parse_time_to_minutes,
+)
+
+INVALIDOS = ["", "abc", "1:00", "1:00:00:00", "1.5:00:00", "1_0:00:00", "١:٢:٣"]
+
+
+def generar_tiempos(filas, semilla=0):
+    """Columna de tiempos como la del CSV de atenciones, con un 1% de nulos y
+    un 1% de valores mal formados o que solo int() acepta"""
+    rng = np.random.default_rng(semilla)
+    segundos = rng.integers(0, 48 * 3600, filas)
+    tiempos = pd.Series(
+        [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in segundos],
+        dtype=object,
+    )
+    sorteo = rng.random(filas)
+    tiempos[sorteo < 0.01] = None
+    invalidos = (sorteo >= 0.01) & (sorteo < 0.02)
+    tiempos[invalidos] = rng.choice(INVALIDOS, invalidos.sum())
+    return tiempos
+
+
+def medir(funcion, repeticiones):
+    mejor, resultado = float("inf"), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    tiempos = generar_tiempos(args.filas)
+    escalar, esperado = medir(
+        lambda: tiempos.apply(parse_time_to_minutes), args.repeticiones
+    )
+    vectorizado, obtenido = medir(
+        lambda: parse_time_column_to_minutes(tiempos), args.repeticiones
+    )
+    iguales = np.array_equal(obtenido.to_numpy(), esperado.to_numpy(dtype=float))
+
+    print(f"filas: {args.filas:,}  valores distintos: {tiempos.nunique():,}")
+    print(f"apply(parse_time_to_minutes):  {escalar:.3f} s")
+    print(f"parse_time_column_to_minutes: {vectorizado:.3f} s")
+    print(f"aceleración: {escalar / vectorizado:.1f}x  resultados iguales: {iguales}")
+
+
+if __name__ == "__main__":
+    main()
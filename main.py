@@ -202,7 +202,39 @@ def get_available_projects():
             "descripcion": "Análisis completo de desplazamiento forzado y hechos victimizantes",
             "icon": "",
             "color": "#dc2626",
+            # Un CSV o un directorio con un CSV por año/mes (p. ej. data/datos/2024.csv)
             "archivo_datos": "data/datos.csv",
+            # "streaming" agrega el CSV por bloques sin cargarlo completo
+            # (se activa solo si el archivo supera UMBRAL_STREAMING_MB)
+            "modo_carga": "auto",
+            # Años que muestran los análisis (sin esta clave, todos los del
+            # archivo); con un directorio de particiones, además solo se leen
+            # las de estos años
+            "anos": [2024, 2025],
+            # "pestanas" calcula todos los análisis en cada interacción;
+            # por defecto solo se calcula el análisis seleccionado
+            "navegacion": "selector",
+            # True estima las declaraciones únicas con HyperLogLog (con un
+            # interruptor para calcular los valores exactos)
+            "modo_aproximado": False,
+            # Grupos de edad del análisis demográfico: intervalos (límite
+            # anterior, límite]; sin esta clave se usan 0-17, 18-28, 29-40,
+            # 41-60 y 60+
+            # "grupos_edad": {
+            #     "limites": [0, 17, 28, 40, 60, 150],
+            #     "etiquetas": ["0-17", "18-28", "29-40", "41-60", "60+"],
+            # },
+        },
+        "analisis_atenciones": {
+            "nombre": "Análisis Integral de Atenciones",
+            "descripcion": "Seguimiento y análisis de productividad por funcionario y sede",
+            "icon": "",
+            "color": "#6366f1",
+            # El reporte lee siempre data/atenciones.csv
+            "archivo_datos": "data/atenciones.csv",
+            # Sedes (con más atenciones) que muestran el detalle por
+            # funcionario en la pestaña de sedes; por defecto 10
+            # "sedes_detalle": 10,
         },
         # Agrega más proyectos aquí
         # "otro_proyecto": {
@@ -2,58 +2,131 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from utils.agregados import (
+    distribucion_edad,
+    histograma_edad,
+    media_edad,
+    mediana_edad,
+    top_k,
+)
+from utils.contexto import resultados
+from utils.figuras import figura
+
+COLORES = ["#dc2626", "#ea580c"]
+COLORES_EDAD = ["#059669", "#10b981"]
+
+
+def por_anos(conteos, columna):
+    """Une los conteos de cada año en formato largo para un gráfico agrupado"""
+    return pd.DataFrame(
+        {
+            columna: [valor for serie in conteos.values() for valor in serie.index],
+            "Cantidad": [valor for serie in conteos.values() for valor in serie.values],
+            "Año": [str(ano) for ano, serie in conteos.items() for _ in serie],
+        }
+    )
+
 
-def render(df, tipo_texto, ubicacion_texto):
+def colores_anos(etiquetas, colores):
+    """Asigna a cada año un color de la paleta, en orden"""
+    return {etiqueta: colores[i % len(colores)] for i, etiqueta in enumerate(etiquetas)}
+
+
+def grafico_anos(tabla, columna, colores, altura, margen_inferior=None, angulo=None):
+    """Barras agrupadas por año de una tabla en formato largo (ver `por_anos`)"""
+    fig = px.bar(
+        tabla,
+        x=columna,
+        y="Cantidad",
+        color="Año",
+        barmode="group",
+        color_discrete_map=colores,
+        text="Cantidad",
+    )
+    fig.update_traces(texttemplate="%{text:,}", textposition="outside")
+    margen = dict(t=50)
+    if margen_inferior is not None:
+        margen["b"] = margen_inferior
+    fig.update_layout(height=altura, margin=margen)
+    if angulo is not None:
+        fig.update_xaxes(tickangle=angulo)
+    return fig
+
+
+def calcular(contexto):
+    """Tablas de género, grupos de edad y enfoque diferencial por año"""
+    anos = contexto["anos"]
+    cubos_ano = contexto["por_ano"]
+
+    generos = top_k(
+        contexto["cubo"]["hechos_demografia"],
+        "genero",
+        None,
+        por="ano_declara",
+        claves=anos,
+    )
+    generos = {ano: generos[ano] for ano in anos}
+    # Todos los años en una pasada sobre la distribución de edades
+    histograma = histograma_edad(
+        contexto["cubo"]["edades"],
+        claves=anos,
+        limites=contexto["grupos_edad"]["limites"],
+        etiquetas=contexto["grupos_edad"]["etiquetas"],
+    )
+    edad_counts = {ano: histograma.loc[ano] for ano in anos}
+    edades = {ano: distribucion_edad(cubos_ano[ano]["edades"]) for ano in anos}
+    enfoques = top_k(
+        contexto["cubo"]["hechos_demografia"],
+        "enfoque_diferencial",
+        10,
+        por="ano_declara",
+        claves=anos,
+    )
+    enfoques = {ano: enfoques[ano] for ano in anos}
+
+    return {
+        "generos": {
+            ano: pd.DataFrame({"Género": serie.index, "Cantidad": serie.values})
+            for ano, serie in generos.items()
+        },
+        "generos_anos": por_anos(generos, "Género"),
+        "edades_anos": por_anos(edad_counts, "Grupo de Edad"),
+        "edad_media": {ano: media_edad(edades[ano]) for ano in anos},
+        "edad_mediana": {ano: mediana_edad(edades[ano]) for ano in anos},
+        "enfoques_anos": por_anos(enfoques, "Enfoque"),
+    }
+
+
+def render(contexto, tipo_texto, ubicacion_texto):
     st.header(f"Análisis Demográfico - {tipo_texto}")
     st.caption(f"Ubicación: {ubicacion_texto}")
     st.caption("Incluye: Todos los hechos victimizantes")
 
-    # Separar por años
-    df_2024 = df[df["ano_declara"] == 2024].copy()
-    df_2025 = df[df["ano_declara"] == 2025].copy()
+    anos = contexto["anos"]
+    etiquetas = [str(ano) for ano in anos]
+    tablas = resultados(contexto, "analisis_demografico", calcular)
 
     # GÉNERO
     st.subheader("Análisis por Género")
     st.caption("Filtro: TODOS LOS MOTIVOS")
 
-    col1, col2, col3 = st.columns([1, 1, 2])
-
-    with col1:
-        st.write("**Año 2024**")
-        gender_2024 = df_2024["genero"].value_counts()
-        gender_2024_df = pd.DataFrame(
-            {"Género": gender_2024.index, "Cantidad": gender_2024.values}
-        )
-        st.dataframe(gender_2024_df, use_container_width=True, hide_index=True)
-
-    with col2:
-        st.write("**Año 2025**")
-        gender_2025 = df_2025["genero"].value_counts()
-        gender_2025_df = pd.DataFrame(
-            {"Género": gender_2025.index, "Cantidad": gender_2025.values}
+    columnas = st.columns([1] * len(anos) + [2])
+
+    for i, ano in enumerate(anos):
+        with columnas[i]:
+            st.write(f"**Año {ano}**")
+            st.dataframe(
+                tablas["generos"][ano], use_container_width=True, hide_index=True
+            )
+
+    with columnas[-1]:
+        fig = figura(
+            grafico_anos,
+            tablas["generos_anos"],
+            "Género",
+            colores_anos(etiquetas, COLORES),
+            altura=400,
         )
-        st.dataframe(gender_2025_df, use_container_width=True, hide_index=True)
-
-    with col3:
-        gender_data = pd.DataFrame(
-            {
-                "Género": list(gender_2024.index) + list(gender_2025.index),
-                "Cantidad": list(gender_2024.values) + list(gender_2025.values),
-                "Año": ["2024"] * len(gender_2024) + ["2025"] * len(gender_2025),
-            }
-        )
-
-        fig = px.bar(
-            gender_data,
-            x="Género",
-            y="Cantidad",
-            color="Año",
-            barmode="group",
-            color_discrete_map={"2024": "#dc2626", "2025": "#ea580c"},
-            text="Cantidad",
-        )
-        fig.update_traces(texttemplate="%{text:,}", textposition="outside")
-        fig.update_layout(height=400, margin=dict(t=50))
         st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("---")
@@ -62,55 +135,21 @@ def render(df, tipo_texto, ubicacion_texto):
     st.subheader("Análisis por Grupos de Edad")
     st.caption("Filtro: TODOS LOS MOTIVOS")
 
-    df_2024_edad = df_2024[df_2024["edad"].notna()].copy()
-    df_2024_edad["grupo_edad"] = pd.cut(
-        df_2024_edad["edad"],
-        bins=[0, 17, 28, 40, 60, 150],
-        labels=["0-17", "18-28", "29-40", "41-60", "60+"],
-    )
-
-    edad_counts_2024 = df_2024_edad["grupo_edad"].value_counts().sort_index()
-
-    df_2025_edad = df_2025[df_2025["edad"].notna()].copy()
-    df_2025_edad["grupo_edad"] = pd.cut(
-        df_2025_edad["edad"],
-        bins=[0, 17, 28, 40, 60, 150],
-        labels=["0-17", "18-28", "29-40", "41-60", "60+"],
+    fig = figura(
+        grafico_anos,
+        tablas["edades_anos"],
+        "Grupo de Edad",
+        colores_anos(etiquetas, COLORES_EDAD),
+        altura=450,
     )
-
-    edad_counts_2025 = df_2025_edad["grupo_edad"].value_counts().sort_index()
-
-    edad_df = pd.DataFrame(
-        {
-            "Grupo de Edad": list(edad_counts_2024.index)
-            + list(edad_counts_2025.index),
-            "Cantidad": list(edad_counts_2024.values) + list(edad_counts_2025.values),
-            "Año": ["2024"] * len(edad_counts_2024) + ["2025"] * len(edad_counts_2025),
-        }
-    )
-
-    fig = px.bar(
-        edad_df,
-        x="Grupo de Edad",
-        y="Cantidad",
-        color="Año",
-        barmode="group",
-        color_discrete_map={"2024": "#059669", "2025": "#10b981"},
-        text="Cantidad",
-    )
-    fig.update_traces(texttemplate="%{text:,}", textposition="outside")
-    fig.update_layout(height=450, margin=dict(t=50))
     st.plotly_chart(fig, use_container_width=True)
 
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("Edad Promedio 2024", f"{df_2024_edad['edad'].mean():.1f} años")
-    with col2:
-        st.metric("Edad Mediana 2024", f"{df_2024_edad['edad'].median():.0f} años")
-    with col3:
-        st.metric("Edad Promedio 2025", f"{df_2025_edad['edad'].mean():.1f} años")
-    with col4:
-        st.metric("Edad Mediana 2025", f"{df_2025_edad['edad'].median():.0f} años")
+    columnas = st.columns(2 * len(anos))
+    for i, ano in enumerate(anos):
+        with columnas[2 * i]:
+            st.metric(f"Edad Promedio {ano}", f"{tablas['edad_media'][ano]:.1f} años")
+        with columnas[2 * i + 1]:
+            st.metric(f"Edad Mediana {ano}", f"{tablas['edad_mediana'][ano]:.0f} años")
 
     st.markdown("---")
 
@@ -118,27 +157,13 @@ def render(df, tipo_texto, ubicacion_texto):
     st.subheader("Enfoque Diferencial")
     st.caption("Filtro: TODOS LOS MOTIVOS")
 
-    enfoque_2024 = df_2024["enfoque_diferencial"].value_counts().head(10)
-    enfoque_2025 = df_2025["enfoque_diferencial"].value_counts().head(10)
-
-    enfoque_data = pd.DataFrame(
-        {
-            "Enfoque": list(enfoque_2024.index) + list(enfoque_2025.index),
-            "Cantidad": list(enfoque_2024.values) + list(enfoque_2025.values),
-            "Año": ["2024"] * len(enfoque_2024) + ["2025"] * len(enfoque_2025),
-        }
-    )
-
-    fig = px.bar(
-        enfoque_data,
-        x="Enfoque",
-        y="Cantidad",
-        color="Año",
-        barmode="group",
-        color_discrete_map={"2024": "#dc2626", "2025": "#ea580c"},
-        text="Cantidad",
+    fig = figura(
+        grafico_anos,
+        tablas["enfoques_anos"],
+        "Enfoque",
+        colores_anos(etiquetas, COLORES),
+        altura=400,
+        margen_inferior=100,
+        angulo=-45,
     )
-    fig.update_traces(texttemplate="%{text:,}", textposition="outside")
-    fig.update_layout(height=400, margin=dict(t=50, b=100))
-    fig.update_xaxes(tickangle=-45)
     st.plotly_chart(fig, use_container_width=True)
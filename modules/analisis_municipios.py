@@ -2,121 +2,115 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from utils.agregados import distintos_aproximados, top_k
+from utils.contexto import resultados
+from utils.figuras import figura
 
-def render(df, tipo_texto, ubicacion_texto):
-    st.header(f"Análisis por Ubicación - {tipo_texto}")
-    st.caption(f"Ubicación: {ubicacion_texto}")
-    st.caption("Incluye: Todos los hechos victimizantes")
+COLORES = ["#dc2626", "#ea580c"]
 
-    # Separar por años
-    df_2024 = df[df["ano_declara"] == 2024].copy()
-    df_2025 = df[df["ano_declara"] == 2025].copy()
 
-    total_declaraciones_2024 = df_2024["id_atencion"].nunique()
-    total_declaraciones_2025 = df_2025["id_atencion"].nunique()
+def texto_ubicacion(origen):
+    """Municipio o barrio según el origen"""
+    # La dimensión `ubicacion` del cubo ya corresponde al origen
+    return "Municipio" if origen == "INTERMUNICIPAL" else "Barrio"
 
-    # Determinar si es municipio o barrio
-    if tipo_texto == "INTERMUNICIPAL":
-        campo_ubicacion = "municipio_procede"
-        texto_ubicacion = "Municipio"
-    else:
-        campo_ubicacion = "barrio_procede"
-        texto_ubicacion = "Barrio"
 
-    col1, col2 = st.columns(2)
+def top_aproximado(bosquejos, anos, k):
+    """Top k de ubicaciones por declaraciones estimadas con los bosquejos"""
+    estimados = distintos_aproximados(bosquejos, ["ano_declara", "ubicacion"])
+    anos_estimados = estimados.index.get_level_values("ano_declara")
+    return {
+        ano: estimados[anos_estimados == ano]
+        .droplevel("ano_declara")
+        .sort_values(ascending=False, kind="stable")
+        .head(k)
+        for ano in anos
+    }
 
-    with col1:
-        st.subheader(f"Top 15 {texto_ubicacion}s 2024")
-        st.caption("Filtro: TODOS LOS MOTIVOS")
 
-        ubicacion_2024 = (
-            df_2024.groupby(campo_ubicacion)["id_atencion"]
-            .nunique()
-            .sort_values(ascending=False)
-            .head(15)
+def calcular(contexto):
+    """Top 15 de ubicaciones por declaraciones en cada año"""
+    columna = texto_ubicacion(contexto["origen"])
+    anos = contexto["anos"]
+    if contexto["error"] is None:
+        tops = top_k(
+            contexto["cubo"]["declaraciones_ubicacion"],
+            "ubicacion",
+            15,
+            medida="declaraciones",
+            por="ano_declara",
+            claves=anos,
         )
-        ubicacion_2024_df = pd.DataFrame(
+    else:
+        tops = top_aproximado(contexto["cubo"]["bosquejos_ubicacion"], anos, 15)
+    tablas = {}
+    for ano in anos:
+        total_declaraciones = contexto["totales"][ano]["declaraciones"]
+        ubicacion = tops[ano]
+        tablas[ano] = pd.DataFrame(
             {
-                texto_ubicacion: ubicacion_2024.index,
-                "Declaraciones": ubicacion_2024.values,
-                "Porcentaje": (
-                    ubicacion_2024.values / total_declaraciones_2024 * 100
-                ).round(1),
+                columna: ubicacion.index,
+                "Declaraciones": ubicacion.values,
+                "Porcentaje": (ubicacion.values / total_declaraciones * 100).round(1),
             }
         )
+    return tablas
 
-        fig = go.Figure()
-        fig.add_trace(
-            go.Bar(
-                y=ubicacion_2024_df[texto_ubicacion],
-                x=ubicacion_2024_df["Declaraciones"],
-                orientation="h",
-                text=[
-                    f"{val:,}<br>({pct}%)"
-                    for val, pct in zip(
-                        ubicacion_2024_df["Declaraciones"],
-                        ubicacion_2024_df["Porcentaje"],
-                    )
-                ],
-                textposition="outside",
-                marker_color="#dc2626",
-                hovertemplate="%{y}<br>Declaraciones: %{x:,}<extra></extra>",
-            )
-        )
-        fig.update_layout(
-            height=600,
-            showlegend=False,
-            yaxis={"categoryorder": "total ascending"},
-            xaxis_title="Número de Declaraciones",
-            margin=dict(r=150, l=150, t=30, b=50),
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(ubicacion_2024_df, use_container_width=True, hide_index=True)
-
-    with col2:
-        st.subheader(f"Top 15 {texto_ubicacion}s 2025")
-        st.caption("Filtro: TODOS LOS MOTIVOS")
-
-        ubicacion_2025 = (
-            df_2025.groupby(campo_ubicacion)["id_atencion"]
-            .nunique()
-            .sort_values(ascending=False)
-            .head(15)
-        )
-        ubicacion_2025_df = pd.DataFrame(
-            {
-                texto_ubicacion: ubicacion_2025.index,
-                "Declaraciones": ubicacion_2025.values,
-                "Porcentaje": (
-                    ubicacion_2025.values / total_declaraciones_2025 * 100
-                ).round(1),
-            }
-        )
 
-        fig = go.Figure()
-        fig.add_trace(
-            go.Bar(
-                y=ubicacion_2025_df[texto_ubicacion],
-                x=ubicacion_2025_df["Declaraciones"],
-                orientation="h",
-                text=[
-                    f"{val:,}<br>({pct}%)"
-                    for val, pct in zip(
-                        ubicacion_2025_df["Declaraciones"],
-                        ubicacion_2025_df["Porcentaje"],
-                    )
-                ],
-                textposition="outside",
-                marker_color="#ea580c",
-                hovertemplate="%{y}<br>Declaraciones: %{x:,}<extra></extra>",
-            )
+def grafico(tabla, color):
+    """Barras horizontales con las ubicaciones (municipios o barrios) de un año"""
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            y=tabla[tabla.columns[0]],
+            x=tabla["Declaraciones"],
+            orientation="h",
+            text=[
+                f"{val:,}<br>({pct}%)"
+                for val, pct in zip(
+                    tabla["Declaraciones"],
+                    tabla["Porcentaje"],
+                )
+            ],
+            textposition="outside",
+            marker_color=color,
+            hovertemplate="%{y}<br>Declaraciones: %{x:,}<extra></extra>",
         )
-        fig.update_layout(
-            height=600,
-            showlegend=False,
-            yaxis={"categoryorder": "total ascending"},
-            xaxis_title="Número de Declaraciones",
-            margin=dict(r=150, l=150, t=30, b=50),
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(ubicacion_2025_df, use_container_width=True, hide_index=True)
+    )
+    fig.update_layout(
+        height=600,
+        showlegend=False,
+        yaxis={"categoryorder": "total ascending"},
+        xaxis_title="Número de Declaraciones",
+        margin=dict(r=150, l=150, t=30, b=50),
+    )
+    return fig
+
+
+def render(contexto, tipo_texto, ubicacion_texto):
+    st.header(f"Análisis por Ubicación - {tipo_texto}")
+    st.caption(f"Ubicación: {ubicacion_texto}")
+    st.caption("Incluye: Todos los hechos victimizantes")
+
+    anos = contexto["anos"]
+    columna = texto_ubicacion(contexto["origen"])
+    tablas = resultados(contexto, "analisis_municipios", calcular)
+
+    columnas = st.columns(len(anos))
+
+    for i, ano in enumerate(anos):
+        with columnas[i]:
+            st.subheader(f"Top 15 {columna}s {ano}")
+            st.caption("Filtro: TODOS LOS MOTIVOS")
+            if contexto["error"] is not None:
+                error = contexto["error"]["ubicaciones"]
+                st.caption(
+                    f"Declaraciones estimadas: ±{error:.1%} típico, "
+                    f"±{2 * error:.1%} con 95% de confianza"
+                )
+
+            ubicacion_df = tablas[ano]
+
+            fig = figura(grafico, ubicacion_df, COLORES[i % len(COLORES)])
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(ubicacion_df, use_container_width=True, hide_index=True)
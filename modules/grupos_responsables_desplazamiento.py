@@ -2,13 +2,76 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from utils.agregados import HECHO_DESPLAZAMIENTO, top_k
+from utils.contexto import resultados
+from utils.figuras import figura
 
-def render(df, tipo_texto, ubicacion_texto):
+COLORES = ["#dc2626", "#ea580c"]
+
+
+def calcular(contexto):
+    """Top 20 de grupos responsables de desplazamiento por año"""
+    anos = contexto["anos"]
+    tops = top_k(
+        contexto["cubo"]["hechos_responsable"],
+        "presunto_responsable",
+        20,
+        por="ano_declara",
+        claves=anos,
+        hecho_victimizante=HECHO_DESPLAZAMIENTO,
+    )
+    tablas = {}
+    for ano in anos:
+        desplaz_pers = contexto["totales"][ano]["personas_desplazamiento"]
+        if desplaz_pers == 0:
+            continue
+        grupos_despl = tops[ano]
+        tablas[ano] = pd.DataFrame(
+            {
+                "Grupo": grupos_despl.index,
+                "Casos": grupos_despl.values,
+                "Porcentaje": (grupos_despl.values / desplaz_pers * 100).round(1),
+            }
+        )
+    return tablas
+
+
+def grafico(tabla, color):
+    """Barras horizontales con los grupos responsables de un año"""
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            y=tabla["Grupo"],
+            x=tabla["Casos"],
+            orientation="h",
+            text=[
+                f"{val:,}<br>({pct}%)"
+                for val, pct in zip(
+                    tabla["Casos"],
+                    tabla["Porcentaje"],
+                )
+            ],
+            textposition="outside",
+            marker_color=color,
+            hovertemplate="%{y}<br>Casos: %{x:,}<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        height=700,
+        showlegend=False,
+        yaxis={"categoryorder": "total ascending"},
+        xaxis_title="Cantidad de Casos",
+        margin=dict(r=150, l=250, t=30, b=50),
+    )
+    return fig
+
+
+def render(contexto, tipo_texto, ubicacion_texto):
     """
     Renderiza la página de grupos responsables solo para desplazamiento forzado
 
     Args:
-        df: DataFrame con los datos filtrados
+        contexto: Contexto de análisis del origen seleccionado
         tipo_texto: Tipo de origen (INTERMUNICIPAL o INTRAURBANO)
         ubicacion_texto: Descripción de la ubicación
     """
@@ -17,118 +80,32 @@ def render(df, tipo_texto, ubicacion_texto):
     st.caption("Filtro: ÚNICAMENTE casos de Desplazamiento Forzado")
 
     # Filtrar solo desplazamiento
-    df_desplaz = df[df["hecho_victimizante"] == "Desplazamiento forzado"].copy()
-
-    df_desplaz_2024 = df_desplaz[df_desplaz["ano_declara"] == 2024].copy()
-    df_desplaz_2025 = df_desplaz[df_desplaz["ano_declara"] == 2025].copy()
+    anos = contexto["anos"]
+    desplaz_pers = {
+        ano: contexto["totales"][ano]["personas_desplazamiento"] for ano in anos
+    }
 
-    desplaz_pers_2024 = len(df_desplaz_2024)
-    desplaz_pers_2025 = len(df_desplaz_2025)
-
-    if desplaz_pers_2024 == 0 and desplaz_pers_2025 == 0:
+    if not any(desplaz_pers.values()):
         st.warning(
             "No hay registros de desplazamiento forzado para este tipo de origen."
         )
         return
 
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.subheader("Grupos Responsables 2024")
-        st.caption(f"Filtro: SOLO DESPLAZAMIENTO | Total casos: {desplaz_pers_2024:,}")
+    tablas = resultados(contexto, "grupos_responsables_desplazamiento", calcular)
+    columnas = st.columns(len(anos))
 
-        if desplaz_pers_2024 > 0:
-            grupos_despl_2024 = (
-                df_desplaz_2024["presunto_responsable"].value_counts().head(20)
-            )
-            grupos_despl_2024_df = pd.DataFrame(
-                {
-                    "Grupo": grupos_despl_2024.index,
-                    "Casos": grupos_despl_2024.values,
-                    "Porcentaje": (
-                        grupos_despl_2024.values / desplaz_pers_2024 * 100
-                    ).round(1),
-                }
+    for i, ano in enumerate(anos):
+        with columnas[i]:
+            st.subheader(f"Grupos Responsables {ano}")
+            st.caption(
+                f"Filtro: SOLO DESPLAZAMIENTO | Total casos: {desplaz_pers[ano]:,}"
             )
 
-            fig = go.Figure()
-            fig.add_trace(
-                go.Bar(
-                    y=grupos_despl_2024_df["Grupo"],
-                    x=grupos_despl_2024_df["Casos"],
-                    orientation="h",
-                    text=[
-                        f"{val:,}<br>({pct}%)"
-                        for val, pct in zip(
-                            grupos_despl_2024_df["Casos"],
-                            grupos_despl_2024_df["Porcentaje"],
-                        )
-                    ],
-                    textposition="outside",
-                    marker_color="#dc2626",
-                    hovertemplate="%{y}<br>Casos: %{x:,}<extra></extra>",
-                )
-            )
-            fig.update_layout(
-                height=700,
-                showlegend=False,
-                yaxis={"categoryorder": "total ascending"},
-                xaxis_title="Cantidad de Casos",
-                margin=dict(r=150, l=250, t=30, b=50),
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            st.dataframe(
-                grupos_despl_2024_df, use_container_width=True, hide_index=True
-            )
-        else:
-            st.info("No hay datos de desplazamiento para 2024")
-
-    with col2:
-        st.subheader("Grupos Responsables 2025")
-        st.caption(f"Filtro: SOLO DESPLAZAMIENTO | Total casos: {desplaz_pers_2025:,}")
-
-        if desplaz_pers_2025 > 0:
-            grupos_despl_2025 = (
-                df_desplaz_2025["presunto_responsable"].value_counts().head(20)
-            )
-            grupos_despl_2025_df = pd.DataFrame(
-                {
-                    "Grupo": grupos_despl_2025.index,
-                    "Casos": grupos_despl_2025.values,
-                    "Porcentaje": (
-                        grupos_despl_2025.values / desplaz_pers_2025 * 100
-                    ).round(1),
-                }
-            )
+            if desplaz_pers[ano] > 0:
+                grupos_despl_df = tablas[ano]
 
-            fig = go.Figure()
-            fig.add_trace(
-                go.Bar(
-                    y=grupos_despl_2025_df["Grupo"],
-                    x=grupos_despl_2025_df["Casos"],
-                    orientation="h",
-                    text=[
-                        f"{val:,}<br>({pct}%)"
-                        for val, pct in zip(
-                            grupos_despl_2025_df["Casos"],
-                            grupos_despl_2025_df["Porcentaje"],
-                        )
-                    ],
-                    textposition="outside",
-                    marker_color="#ea580c",
-                    hovertemplate="%{y}<br>Casos: %{x:,}<extra></extra>",
-                )
-            )
-            fig.update_layout(
-                height=700,
-                showlegend=False,
-                yaxis={"categoryorder": "total ascending"},
-                xaxis_title="Cantidad de Casos",
-                margin=dict(r=150, l=250, t=30, b=50),
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            st.dataframe(
-                grupos_despl_2025_df, use_container_width=True, hide_index=True
-            )
-        else:
-            st.info("No hay datos de desplazamiento para 2025")
+                fig = figura(grafico, grupos_despl_df, COLORES[i % len(COLORES)])
+                st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(grupos_despl_df, use_container_width=True, hide_index=True)
+            else:
+                st.info(f"No hay datos de desplazamiento para {ano}")
@@ -2,99 +2,84 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from utils.agregados import top_k
+from utils.contexto import resultados
+from utils.figuras import figura
 
-def render(df, tipo_texto, ubicacion_texto):
-    st.header(f"Grupos Responsables - {tipo_texto}")
-    st.caption(f"Ubicación: {ubicacion_texto}")
-    st.caption(
-        "Incluye: TODOS los hechos victimizantes (Desplazamiento, Homicidio, Amenaza, etc.)"
-    )
-
-    # Separar por años
-    df_2024 = df[df["ano_declara"] == 2024].copy()
-    df_2025 = df[df["ano_declara"] == 2025].copy()
-
-    total_personas_2024 = len(df_2024)
-    total_personas_2025 = len(df_2025)
+COLORES = ["#7c3aed", "#6366f1"]
 
-    col1, col2 = st.columns(2)
 
-    with col1:
-        st.subheader("Grupos Responsables 2024")
-        st.caption(f"Filtro: TODOS LOS MOTIVOS | Total casos: {total_personas_2024:,}")
-
-        grupos_2024 = df_2024["presunto_responsable"].value_counts().head(20)
-        grupos_2024_df = pd.DataFrame(
+def calcular(contexto):
+    """Top 20 de grupos responsables por año, con su porcentaje"""
+    anos = contexto["anos"]
+    tops = top_k(
+        contexto["cubo"]["hechos_responsable"],
+        "presunto_responsable",
+        20,
+        por="ano_declara",
+        claves=anos,
+    )
+    tablas = {}
+    for ano in anos:
+        total_personas = contexto["totales"][ano]["personas"]
+        grupos = tops[ano]
+        tablas[ano] = pd.DataFrame(
             {
-                "Grupo": grupos_2024.index,
-                "Casos": grupos_2024.values,
-                "Porcentaje": (grupos_2024.values / total_personas_2024 * 100).round(1),
+                "Grupo": grupos.index,
+                "Casos": grupos.values,
+                "Porcentaje": (grupos.values / total_personas * 100).round(1),
             }
         )
+    return tablas
 
-        fig = go.Figure()
-        fig.add_trace(
-            go.Bar(
-                y=grupos_2024_df["Grupo"],
-                x=grupos_2024_df["Casos"],
-                orientation="h",
-                text=[
-                    f"{val:,}<br>({pct}%)"
-                    for val, pct in zip(
-                        grupos_2024_df["Casos"], grupos_2024_df["Porcentaje"]
-                    )
-                ],
-                textposition="outside",
-                marker_color="#7c3aed",
-                hovertemplate="%{y}<br>Casos: %{x:,}<extra></extra>",
-            )
-        )
-        fig.update_layout(
-            height=700,
-            showlegend=False,
-            yaxis={"categoryorder": "total ascending"},
-            xaxis_title="Cantidad de Casos",
-            margin=dict(r=150, l=250, t=30, b=50),
+
+def grafico(tabla, color):
+    """Barras horizontales con los grupos responsables de un año"""
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            y=tabla["Grupo"],
+            x=tabla["Casos"],
+            orientation="h",
+            text=[
+                f"{val:,}<br>({pct}%)"
+                for val, pct in zip(tabla["Casos"], tabla["Porcentaje"])
+            ],
+            textposition="outside",
+            marker_color=color,
+            hovertemplate="%{y}<br>Casos: %{x:,}<extra></extra>",
         )
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(grupos_2024_df, use_container_width=True, hide_index=True)
+    )
+    fig.update_layout(
+        height=700,
+        showlegend=False,
+        yaxis={"categoryorder": "total ascending"},
+        xaxis_title="Cantidad de Casos",
+        margin=dict(r=150, l=250, t=30, b=50),
+    )
+    return fig
 
-    with col2:
-        st.subheader("Grupos Responsables 2025")
-        st.caption(f"Filtro: TODOS LOS MOTIVOS | Total casos: {total_personas_2025:,}")
 
-        grupos_2025 = df_2025["presunto_responsable"].value_counts().head(20)
-        grupos_2025_df = pd.DataFrame(
-            {
-                "Grupo": grupos_2025.index,
-                "Casos": grupos_2025.values,
-                "Porcentaje": (grupos_2025.values / total_personas_2025 * 100).round(1),
-            }
-        )
+def render(contexto, tipo_texto, ubicacion_texto):
+    st.header(f"Grupos Responsables - {tipo_texto}")
+    st.caption(f"Ubicación: {ubicacion_texto}")
+    st.caption(
+        "Incluye: TODOS los hechos victimizantes (Desplazamiento, Homicidio, Amenaza, etc.)"
+    )
 
-        fig = go.Figure()
-        fig.add_trace(
-            go.Bar(
-                y=grupos_2025_df["Grupo"],
-                x=grupos_2025_df["Casos"],
-                orientation="h",
-                text=[
-                    f"{val:,}<br>({pct}%)"
-                    for val, pct in zip(
-                        grupos_2025_df["Casos"], grupos_2025_df["Porcentaje"]
-                    )
-                ],
-                textposition="outside",
-                marker_color="#6366f1",
-                hovertemplate="%{y}<br>Casos: %{x:,}<extra></extra>",
-            )
-        )
-        fig.update_layout(
-            height=700,
-            showlegend=False,
-            yaxis={"categoryorder": "total ascending"},
-            xaxis_title="Cantidad de Casos",
-            margin=dict(r=150, l=250, t=30, b=50),
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(grupos_2025_df, use_container_width=True, hide_index=True)
+    anos = contexto["anos"]
+    tablas = resultados(contexto, "grupos_responsables_todos", calcular)
+    columnas = st.columns(len(anos))
+
+    for i, ano in enumerate(anos):
+        total_personas = contexto["totales"][ano]["personas"]
+
+        with columnas[i]:
+            st.subheader(f"Grupos Responsables {ano}")
+            st.caption(f"Filtro: TODOS LOS MOTIVOS | Total casos: {total_personas:,}")
+
+            grupos_df = tablas[ano]
+
+            fig = figura(grafico, grupos_df, COLORES[i % len(COLORES)])
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(grupos_df, use_container_width=True, hide_index=True)
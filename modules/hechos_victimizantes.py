@@ -2,101 +2,84 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
+from utils.agregados import top_k
+from utils.contexto import resultados
+from utils.figuras import figura
 
-def render(df, tipo_texto, ubicacion_texto):
-    st.header(f"Hechos Victimizantes - {tipo_texto}")
-    st.caption(f"Ubicación: {ubicacion_texto}")
-    st.caption("Muestra: Todos los hechos victimizantes registrados")
-
-    # Separar por años
-    df_2024 = df[df["ano_declara"] == 2024].copy()
-    df_2025 = df[df["ano_declara"] == 2025].copy()
-
-    total_personas_2024 = len(df_2024)
-    total_personas_2025 = len(df_2025)
-
-    col1, col2 = st.columns(2)
+COLORES = ["#dc2626", "#ea580c"]
 
-    with col1:
-        st.subheader("Hechos Victimizantes 2024")
-        st.caption(
-            f"Filtro: TODOS LOS MOTIVOS | Total personas: {total_personas_2024:,}"
-        )
 
-        hechos_2024 = df_2024["hecho_victimizante"].value_counts().head(20)
-        hechos_2024_df = pd.DataFrame(
+def calcular(contexto):
+    """Top 20 de hechos victimizantes por año, con su porcentaje"""
+    anos = contexto["anos"]
+    tops = top_k(
+        contexto["cubo"]["hechos_mes"],
+        "hecho_victimizante",
+        20,
+        por="ano_declara",
+        claves=anos,
+    )
+    tablas = {}
+    for ano in anos:
+        total_personas = contexto["totales"][ano]["personas"]
+        hechos_ano = tops[ano]
+        tablas[ano] = pd.DataFrame(
             {
-                "Hecho": hechos_2024.index,
-                "Cantidad": hechos_2024.values,
-                "Porcentaje": (hechos_2024.values / total_personas_2024 * 100).round(1),
+                "Hecho": hechos_ano.index,
+                "Cantidad": hechos_ano.values,
+                "Porcentaje": (hechos_ano.values / total_personas * 100).round(1),
             }
         )
+    return tablas
 
-        fig = go.Figure()
-        fig.add_trace(
-            go.Bar(
-                y=hechos_2024_df["Hecho"],
-                x=hechos_2024_df["Cantidad"],
-                orientation="h",
-                text=[
-                    f"{val:,}<br>({pct}%)"
-                    for val, pct in zip(
-                        hechos_2024_df["Cantidad"], hechos_2024_df["Porcentaje"]
-                    )
-                ],
-                textposition="outside",
-                marker_color="#dc2626",
-                hovertemplate="%{y}<br>Cantidad: %{x:,}<extra></extra>",
-            )
-        )
-        fig.update_layout(
-            height=700,
-            showlegend=False,
-            yaxis={"categoryorder": "total ascending"},
-            xaxis_title="Cantidad de Personas",
-            margin=dict(r=150, l=200, t=30, b=50),
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(hechos_2024_df, use_container_width=True, hide_index=True)
 
-    with col2:
-        st.subheader("Hechos Victimizantes 2025")
-        st.caption(
-            f"Filtro: TODOS LOS MOTIVOS | Total personas: {total_personas_2025:,}"
+def grafico(tabla, color):
+    """Barras horizontales con los hechos victimizantes de un año"""
+    fig = go.Figure()
+    fig.add_trace(
+        go.Bar(
+            y=tabla["Hecho"],
+            x=tabla["Cantidad"],
+            orientation="h",
+            text=[
+                f"{val:,}<br>({pct}%)"
+                for val, pct in zip(tabla["Cantidad"], tabla["Porcentaje"])
+            ],
+            textposition="outside",
+            marker_color=color,
+            hovertemplate="%{y}<br>Cantidad: %{x:,}<extra></extra>",
         )
+    )
+    fig.update_layout(
+        height=700,
+        showlegend=False,
+        yaxis={"categoryorder": "total ascending"},
+        xaxis_title="Cantidad de Personas",
+        margin=dict(r=150, l=200, t=30, b=50),
+    )
+    return fig
 
-        hechos_2025 = df_2025["hecho_victimizante"].value_counts().head(20)
-        hechos_2025_df = pd.DataFrame(
-            {
-                "Hecho": hechos_2025.index,
-                "Cantidad": hechos_2025.values,
-                "Porcentaje": (hechos_2025.values / total_personas_2025 * 100).round(1),
-            }
-        )
 
-        fig = go.Figure()
-        fig.add_trace(
-            go.Bar(
-                y=hechos_2025_df["Hecho"],
-                x=hechos_2025_df["Cantidad"],
-                orientation="h",
-                text=[
-                    f"{val:,}<br>({pct}%)"
-                    for val, pct in zip(
-                        hechos_2025_df["Cantidad"], hechos_2025_df["Porcentaje"]
-                    )
-                ],
-                textposition="outside",
-                marker_color="#ea580c",
-                hovertemplate="%{y}<br>Cantidad: %{x:,}<extra></extra>",
+def render(contexto, tipo_texto, ubicacion_texto):
+    st.header(f"Hechos Victimizantes - {tipo_texto}")
+    st.caption(f"Ubicación: {ubicacion_texto}")
+    st.caption("Muestra: Todos los hechos victimizantes registrados")
+
+    anos = contexto["anos"]
+    tablas = resultados(contexto, "hechos_victimizantes", calcular)
+    columnas = st.columns(len(anos))
+
+    for i, ano in enumerate(anos):
+        total_personas = contexto["totales"][ano]["personas"]
+
+        with columnas[i]:
+            st.subheader(f"Hechos Victimizantes {ano}")
+            st.caption(
+                f"Filtro: TODOS LOS MOTIVOS | Total personas: {total_personas:,}"
             )
-        )
-        fig.update_layout(
-            height=700,
-            showlegend=False,
-            yaxis={"categoryorder": "total ascending"},
-            xaxis_title="Cantidad de Personas",
-            margin=dict(r=150, l=200, t=30, b=50),
-        )
-        st.plotly_chart(fig, use_container_width=True)
-        st.dataframe(hechos_2025_df, use_container_width=True, hide_index=True)
+
+            hechos_df = tablas[ano]
+
+            fig = figura(grafico, hechos_df, COLORES[i % len(COLORES)])
+            st.plotly_chart(fig, use_container_width=True)
+            st.dataframe(hechos_df, use_container_width=True, hide_index=True)
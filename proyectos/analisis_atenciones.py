@@ -1,9 +1,60 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import io
 import os
-from io import BytesIO
+import tempfile
+import threading
+import weakref
+import zipfile
+from collections import OrderedDict
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from utils.agrupaciones import moda, primeros_distintos
+from utils.figuras import figura
+from utils.indice_invertido import filtrar, indice_invertido, valores
+from utils.registro_datos import obtener
+
+# Columnas de los filtros del reporte, con índice invertido por versión de los datos
+COLUMNAS_FILTRO = ["sede", "funcionario_atendio", "servicio", "area", "estado"]
+
+# Sedes con detalle de funcionarios en la pestaña de sedes (clave "sedes_detalle")
+SEDES_DETALLE = 10
+
+# Exportación a Excel: filas que se convierten a la vez y límite de filas por hoja
+FILAS_BLOQUE_EXPORTACION = 50_000
+MAX_FILAS_EXCEL = 1_048_576
+
+# Formatos del reporte exportable: nombre del archivo y tipo MIME. Parquet y CSV
+# se escriben por bloques (un archivo por hoja dentro de un zip) y no tienen el
+# límite de filas de Excel
+FORMATOS_EXPORTACION = {
+    "Excel": (
+        "reporte_atenciones.xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ),
+    "Parquet": ("reporte_atenciones_parquet.zip", "application/zip"),
+    "CSV": ("reporte_atenciones_csv.zip", "application/zip"),
+}
+
+# Reportes ya generados, por versión de los datos y combinación de filtros (LRU),
+# hasta REPORTES_MAX_MB en total; uno más grande no se guarda
+REPORTES_MAX_MB = 256
+_reportes = OrderedDict()
+_bloqueo_reportes = threading.Lock()
+
+# HH:MM:SS con signo opcional por componente, igual que int() en parse_time_to_minutes
+TIME_PATTERN = (
+    r"^\s*(?P<sh>[+-]?)(?P<h>\d+)\s*:\s*(?P<sm>[+-]?)(?P<m>\d+)"
+    r"\s*:\s*(?P<ss>[+-]?)(?P<s>\d+)\s*$"
+)
 
 
 def parse_time_to_minutes(time_str):
@@ -26,6 +77,47 @@ def parse_time_to_minutes(time_str):
         return 0.0
 
 
+def _signed_time_part(parts, name):
+    value = pc.cast(pc.struct_field(parts, name), pa.float64())
+    negative = pc.equal(pc.struct_field(parts, f"s{name}"), "-")
+    return pc.if_else(negative, pc.negate(value), value)
+
+
+def parse_time_column_to_minutes(series):
+    """
+    Versión vectorizada de parse_time_to_minutes para una columna completa.
+
+    Cada valor distinto se interpreta una sola vez (codificación por diccionario)
+    y el resultado se expande a todas las filas. Nulos o formatos incorrectos
+    devuelven 0; las horas pueden superar 24.
+
+    La expresión regular solo acepta dígitos ASCII; los valores distintos que
+    rechaza se interpretan con parse_time_to_minutes, de modo que lo que int()
+    acepta además ("1_0", dígitos no ASCII como "١:٢:٣") da el mismo resultado.
+    """
+    try:
+        text = pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Valores no textuales (p. ej. columna numérica): mismo str() que la versión escalar
+        text = pa.array(series.astype(str), type=pa.string())
+
+    encoded = text.dictionary_encode()
+    parts = pc.extract_regex(encoded.dictionary, TIME_PATTERN)
+    minutes = pc.add(
+        pc.add(
+            pc.multiply(_signed_time_part(parts, "h"), 60.0),
+            _signed_time_part(parts, "m"),
+        ),
+        pc.divide(_signed_time_part(parts, "s"), 60.0),
+    )
+    minutes = np.array(pc.fill_null(minutes, 0.0), dtype=float)
+    rejected = pc.and_(pc.is_null(parts), pc.is_valid(encoded.dictionary))
+    for i in np.flatnonzero(np.asarray(rejected)):
+        minutes[i] = parse_time_to_minutes(encoded.dictionary[i].as_py())
+    minutes = pc.fill_null(pc.take(pa.array(minutes), encoded.indices), 0.0)
+    return pd.Series(minutes.to_numpy(), index=series.index)
+
+
 def format_minutes_to_time(minutes):
     """Convierte minutos a formato HH:MM:SS"""
     if pd.isna(minutes) or minutes == 0:
@@ -36,55 +128,215 @@ def format_minutes_to_time(minutes):
     return f"{hours:02d}:{mins:02d}:{secs:02d}"
 
 
-def load_data(filepath):
-    """Carga y procesa el CSV de resumen de atenciones."""
-    try:
-        df = pd.read_csv(filepath)
-
-        # Convertir columnas de tiempo (texto) a valor numérico (minutos)
-        time_cols = [
-            "tiempo_promedio",
-            "tiempo_total_dedicado",
-            "tiempo_minimo",
-            "tiempo_maximo",
-        ]
+def parse_data(filepath):
+    """Lee y procesa el CSV de resumen de atenciones."""
+    df = pd.read_csv(filepath)
+
+    # Convertir columnas de tiempo (texto) a valor numérico (minutos)
+    time_cols = [
+        "tiempo_promedio",
+        "tiempo_total_dedicado",
+        "tiempo_minimo",
+        "tiempo_maximo",
+    ]
+
+    for col in time_cols:
+        if col in df.columns:
+            df[f"{col}_num"] = parse_time_column_to_minutes(df[col])
+
+    # Normalizar textos para evitar duplicados
+    text_cols = [
+        "funcionario_atendio",
+        "tipo_atencion",
+        "servicio",
+        "area",
+        "sede",
+        "estado",
+        "poblacion",
+        "dia_semana",
+    ]
+    for col in text_cols:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip()
+            # Mantener formato original pero limpiar espacios
+
+    return df
 
-        for col in time_cols:
-            if col in df.columns:
-                df[f"{col}_num"] = df[col].apply(parse_time_to_minutes)
-
-        # Normalizar textos para evitar duplicados
-        text_cols = [
-            "funcionario_atendio",
-            "tipo_atencion",
-            "servicio",
-            "area",
-            "sede",
-            "estado",
-            "poblacion",
-            "dia_semana",
-        ]
-        for col in text_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.strip()
-                # Mantener formato original pero limpiar espacios
 
-        return df
+def load_data(filepath):
+    """
+    Carga el CSV de resumen de atenciones desde el registro de datasets
+    (se vuelve a leer solo si el archivo cambió).
+    """
+    try:
+        return obtener(
+            "analisis_atenciones.datos", filepath, lambda previo: parse_data(filepath)
+        )
     except Exception as e:
         st.error(f"Error técnico al procesar el archivo: {e}")
         return pd.DataFrame()
 
 
-def export_to_excel(df_dict, filename="reporte_atenciones.xlsx"):
-    """Exporta múltiples DataFrames a un archivo Excel con múltiples hojas"""
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+def _encabezado(hoja, columna):
+    """Celda de encabezado con el mismo estilo que usa pandas.to_excel"""
+    celda = WriteOnlyCell(hoja, value=columna)
+    borde = Side(style="thin")
+    celda.font = Font(bold=True)
+    celda.border = Border(left=borde, right=borde, top=borde, bottom=borde)
+    celda.alignment = Alignment(horizontal="center", vertical="top")
+    return celda
+
+
+def filas_por_bloques(df, tamano=FILAS_BLOQUE_EXPORTACION):
+    """Filas del DataFrame como tuplas, convirtiendo un bloque a la vez (nulos como None)"""
+    for inicio in range(0, len(df), tamano):
+        bloque = df.iloc[inicio:inicio + tamano].astype(object)
+        yield from bloque.where(bloque.notna(), None).itertuples(index=False, name=None)
+
+
+def export_to_excel(df_dict, salida):
+    """
+    Exporta múltiples DataFrames a un archivo Excel con múltiples hojas en
+    `salida` (archivo binario).
+
+    Usa el modo de solo escritura de openpyxl: las filas se escriben a medida
+    que se generan, por bloques, sin crear en memoria las celdas de todo el libro.
+    """
+    wb = Workbook(write_only=True)
+    for sheet_name, df in df_dict.items():
+        if len(df) + 1 > MAX_FILAS_EXCEL:
+            raise ValueError(
+                f"La hoja '{sheet_name}' tiene {len(df):,} filas; "
+                f"Excel admite hasta {MAX_FILAS_EXCEL - 1:,}"
+            )
+        # Limpiar nombre de hoja (Excel tiene límites)
+        hoja = wb.create_sheet(sheet_name[:31])
+        hoja.append([_encabezado(hoja, columna) for columna in df.columns])
+        for fila in filas_por_bloques(df):
+            hoja.append(fila)
+    wb.save(salida)
+
+
+def export_to_csv_zip(df_dict, salida):
+    """
+    Escribe cada hoja como un CSV dentro de un zip en `salida` (archivo binario).
+
+    Las filas se escriben por bloques directamente en el zip: no se arma en
+    memoria ni el texto de una hoja ni el archivo completo.
+    """
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for sheet_name, df in df_dict.items():
+            with zf.open(f"{sheet_name}.csv", "w", force_zip64=True) as archivo, \
+                    io.TextIOWrapper(archivo, encoding="utf-8", newline="") as texto:
+                # Al menos un bloque, para escribir el encabezado de hojas vacías
+                for inicio in range(0, max(len(df), 1), FILAS_BLOQUE_EXPORTACION):
+                    df.iloc[inicio:inicio + FILAS_BLOQUE_EXPORTACION].to_csv(
+                        texto, index=False, header=inicio == 0
+                    )
+
+
+def export_to_parquet(df_dict, salida):
+    """
+    Escribe cada hoja como un archivo Parquet dentro de un zip en `salida`.
+
+    Cada hoja se escribe por bloques de filas (un grupo de filas de Parquet por
+    bloque) en un archivo temporal que luego se copia al zip.
+    """
+    with tempfile.TemporaryDirectory() as directorio, \
+            zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_STORED) as zf:
         for sheet_name, df in df_dict.items():
-            # Limpiar nombre de hoja (Excel tiene límites)
-            clean_name = sheet_name[:31] if len(sheet_name) > 31 else sheet_name
-            df.to_excel(writer, sheet_name=clean_name, index=False)
-    output.seek(0)
-    return output.getvalue()
+            ruta = os.path.join(directorio, "hoja.parquet")
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pq.ParquetWriter(ruta, schema) as escritor:
+                for inicio in range(0, len(df), FILAS_BLOQUE_EXPORTACION):
+                    bloque = df.iloc[inicio:inicio + FILAS_BLOQUE_EXPORTACION]
+                    escritor.write_table(
+                        pa.Table.from_pandas(bloque, schema=schema, preserve_index=False)
+                    )
+            zf.write(ruta, f"{sheet_name}.parquet")
+
+
+def hojas_reporte(df_filtrado, df_funcionario_sede, df_servicios, df_sede, df_area):
+    """Hojas del reporte exportable: datos filtrados y tablas de resumen no vacías"""
+    # Limpiar columnas numéricas auxiliares para exportación
+    cols_to_export = [c for c in df_filtrado.columns if not c.endswith("_num")]
+    export_data = {"Datos Completos": df_filtrado[cols_to_export]}
+
+    # Agregar hojas adicionales
+    if not df_funcionario_sede.empty:
+        export_data["Funcionarios por Sede"] = df_funcionario_sede
+    if not df_servicios.empty:
+        export_data["Servicios"] = df_servicios
+    if not df_sede.empty:
+        export_data["Resumen por Sede"] = df_sede
+    if not df_area.empty:
+        export_data["Resumen por Área"] = df_area
+    return export_data
+
+
+def reporte_guardado(df, filtros, formato="Excel"):
+    """Reporte ya generado para estos datos, filtros y formato, o None"""
+    llave = (id(df), tuple(sorted(filtros.items())), formato)
+    with _bloqueo_reportes:
+        entrada = _reportes.get(llave)
+        if entrada is None or entrada[0]() is not df:
+            return None
+        _reportes.move_to_end(llave)
+        return entrada[1]
+
+
+def guardar_reporte(df, filtros, formato, datos):
+    """
+    Guarda un reporte generado; se descarta cuando los datos dejan de existir o
+    para no superar REPORTES_MAX_MB entre todos los reportes guardados.
+    """
+    limite = REPORTES_MAX_MB * 1024**2
+    if len(datos) > limite:
+        return
+    llave = (id(df), tuple(sorted(filtros.items())), formato)
+    referencia = weakref.ref(df, lambda _, llave=llave: _reportes.pop(llave, None))
+    with _bloqueo_reportes:
+        _reportes[llave] = (referencia, datos)
+        _reportes.move_to_end(llave)
+        while sum(len(entrada[1]) for entrada in _reportes.values()) > limite:
+            _reportes.popitem(last=False)
+
+
+def grafico_productividad(df_funcionario_sede):
+    """Dispersión de volumen contra tiempo promedio por funcionario, con las líneas promedio"""
+    fig_scatter = px.scatter(
+        df_funcionario_sede,
+        x="cantidad_casos",
+        y="tiempo_promedio_real",
+        size="tiempo_total_horas",
+        color="sede",
+        hover_name="funcionario_atendio",
+        hover_data=["sede", "cantidad_casos", "tiempo_promedio_real"],
+        labels={
+            "cantidad_casos": "Volumen de Atenciones",
+            "tiempo_promedio_real": "Tiempo Promedio (Minutos)",
+            "sede": "Sede",
+            "tiempo_total_horas": "Tiempo Total (Horas)"
+        },
+        title="Matriz de Productividad: Volumen vs Velocidad por Sede",
+    )
+    # Líneas promedio
+    mean_x = df_funcionario_sede["cantidad_casos"].mean()
+    mean_y = df_funcionario_sede["tiempo_promedio_real"].mean()
+    fig_scatter.add_hline(
+        y=mean_y, line_dash="dash", line_color="gray", annotation_text="Promedio Tiempo"
+    )
+    fig_scatter.add_vline(
+        x=mean_x, line_dash="dash", line_color="gray", annotation_text="Promedio Volumen"
+    )
+    return fig_scatter
+
+
+def grafico_torta(df, values, names, title):
+    """Gráfico de torta con el porcentaje y la etiqueta dentro de cada porción"""
+    fig_pie = px.pie(df, values=values, names=names, title=title)
+    fig_pie.update_traces(textposition="inside", textinfo="percent+label")
+    return fig_pie
 
 
 def run(project_info):
@@ -108,42 +360,62 @@ def run(project_info):
         st.warning("El archivo de datos está vacío o tiene un formato no válido.")
         return
 
-    # --- FILTROS GLOBALES (Sidebar) ---
-    with st.sidebar:
-        st.header("Filtros de Análisis")
-
-        # Filtro Sede
-        lista_sedes = ["TODAS"] + sorted([s for s in df["sede"].unique().tolist() if pd.notna(s) and s != "NAN"])
-        filtro_sede = st.selectbox("Seleccionar Sede", lista_sedes)
-
-        # Filtro Funcionario
-        lista_funcionarios = ["TODOS"] + sorted([f for f in df["funcionario_atendio"].unique().tolist() if pd.notna(f) and f != "NAN"])
-        filtro_funcionario = st.selectbox("Seleccionar Funcionario", lista_funcionarios)
-
-        # Filtro Servicio
-        lista_servicios = ["TODOS"] + sorted([s for s in df["servicio"].unique().tolist() if pd.notna(s) and s != "NAN"])
-        filtro_servicio = st.selectbox("Seleccionar Servicio", lista_servicios)
-
-        # Filtro Área
-        lista_areas = ["TODAS"] + sorted([a for a in df["area"].unique().tolist() if pd.notna(a) and a != "NAN"])
-        filtro_area = st.selectbox("Seleccionar Área", lista_areas)
-
-        # Filtro Estado
-        lista_estados = ["TODOS"] + sorted([e for e in df["estado"].unique().tolist() if pd.notna(e) and e != "NAN"])
-        filtro_estado = st.selectbox("Seleccionar Estado", lista_estados)
-
-    # Aplicar filtros
-    df_filtrado = df.copy()
-    if filtro_sede != "TODAS":
-        df_filtrado = df_filtrado[df_filtrado["sede"] == filtro_sede]
-    if filtro_funcionario != "TODOS":
-        df_filtrado = df_filtrado[df_filtrado["funcionario_atendio"] == filtro_funcionario]
-    if filtro_servicio != "TODOS":
-        df_filtrado = df_filtrado[df_filtrado["servicio"] == filtro_servicio]
-    if filtro_area != "TODAS":
-        df_filtrado = df_filtrado[df_filtrado["area"] == filtro_area]
-    if filtro_estado != "TODOS":
-        df_filtrado = df_filtrado[df_filtrado["estado"] == filtro_estado]
+    panel_atenciones(df, project_info.get("sedes_detalle", SEDES_DETALLE))
+
+
+@st.fragment
+def panel_atenciones(df, sedes_detalle=SEDES_DETALLE):
+    """
+    Filtros, indicadores, pestañas y exportación del análisis de atenciones.
+
+    Es un fragmento: cambiar un filtro vuelve a ejecutar solo esta sección,
+    no la restauración de sesión de main() ni la barra lateral. Por eso los
+    filtros van al inicio del reporte y no en la barra lateral, que un
+    fragmento no puede modificar.
+    """
+    # --- FILTROS GLOBALES ---
+    st.markdown("#### Filtros de Análisis")
+    col_sede, col_funcionario, col_servicio, col_area, col_estado = st.columns(5)
+
+    # Índice invertido de las columnas filtrables (se construye una vez por versión de los datos)
+    indice = indice_invertido(df, COLUMNAS_FILTRO)
+
+    # Filtro Sede
+    lista_sedes = ["TODAS"] + sorted([s for s in valores(indice, "sede") if pd.notna(s) and s != "NAN"])
+    filtro_sede = col_sede.selectbox("Seleccionar Sede", lista_sedes)
+
+    # Filtro Funcionario
+    lista_funcionarios = ["TODOS"] + sorted([f for f in valores(indice, "funcionario_atendio") if pd.notna(f) and f != "NAN"])
+    filtro_funcionario = col_funcionario.selectbox("Seleccionar Funcionario", lista_funcionarios)
+
+    # Filtro Servicio
+    lista_servicios = ["TODOS"] + sorted([s for s in valores(indice, "servicio") if pd.notna(s) and s != "NAN"])
+    filtro_servicio = col_servicio.selectbox("Seleccionar Servicio", lista_servicios)
+
+    # Filtro Área
+    lista_areas = ["TODAS"] + sorted([a for a in valores(indice, "area") if pd.notna(a) and a != "NAN"])
+    filtro_area = col_area.selectbox("Seleccionar Área", lista_areas)
+
+    # Filtro Estado
+    lista_estados = ["TODOS"] + sorted([e for e in valores(indice, "estado") if pd.notna(e) and e != "NAN"])
+    filtro_estado = col_estado.selectbox("Seleccionar Estado", lista_estados)
+
+    st.markdown("---")
+
+    # Aplicar filtros: intersección de las filas de cada valor en el índice
+    # (df_filtrado puede ser el mismo df compartido: no debe modificarse)
+    filtros = {
+        columna: valor
+        for columna, valor, todos in [
+            ("sede", filtro_sede, "TODAS"),
+            ("funcionario_atendio", filtro_funcionario, "TODOS"),
+            ("servicio", filtro_servicio, "TODOS"),
+            ("area", filtro_area, "TODAS"),
+            ("estado", filtro_estado, "TODOS"),
+        ]
+        if valor != todos
+    }
+    df_filtrado = filtrar(df, indice, **filtros)
 
     # --- INDICADORES CLAVE (KPIs) ---
     col1, col2, col3, col4, col5 = st.columns(5)
@@ -189,19 +461,20 @@ def run(project_info):
         st.subheader("Atenciones por Funcionario y Sede")
         st.markdown("Análisis detallado de la productividad de cada funcionario en cada sede")
 
-        # Agrupar por funcionario y sede
-        df_funcionario_sede = (
-            df_filtrado.groupby(["funcionario_atendio", "sede"])
-            .agg(
-                {
-                    "cantidad_casos": "sum",
-                    "tiempo_total_dedicado_num": "sum",
-                    "servicio": lambda x: ", ".join(str(s) for s in x.unique()[:5] if pd.notna(s)),
-                    "estado": lambda x: x.value_counts().index[0] if len(x) > 0 else "",
-                }
-            )
-            .reset_index()
+        # Agrupar por funcionario y sede (servicios principales y estado más común
+        # con agregaciones vectorizadas, sin una función de Python por grupo)
+        por_funcionario_sede = ["funcionario_atendio", "sede"]
+        df_funcionario_sede = df_filtrado.groupby(por_funcionario_sede).agg(
+            {
+                "cantidad_casos": "sum",
+                "tiempo_total_dedicado_num": "sum",
+            }
+        )
+        df_funcionario_sede["servicio"] = primeros_distintos(
+            df_filtrado, por_funcionario_sede, "servicio", 5
         )
+        df_funcionario_sede["estado"] = moda(df_filtrado, por_funcionario_sede, "estado")
+        df_funcionario_sede = df_funcionario_sede.reset_index()
 
         # Calcular tiempo promedio real (promedio ponderado)
         df_funcionario_sede["tiempo_promedio_real"] = (
@@ -232,7 +505,8 @@ def run(project_info):
         # Gráfico de barras: Top funcionarios por sede
         st.markdown("#### Top 15 Funcionarios por Volumen de Atenciones")
         top_funcionarios = df_funcionario_sede.head(15)
-        fig_bar = px.bar(
+        fig_bar = figura(
+            px.bar,
             top_funcionarios,
             x="cantidad_casos",
             y="funcionario_atendio",
@@ -244,37 +518,13 @@ def run(project_info):
                 "sede": "Sede"
             },
             title="Top 15 Funcionarios por Volumen de Atenciones",
+            height=600,
         )
-        fig_bar.update_layout(height=600)
         st.plotly_chart(fig_bar, use_container_width=True)
 
         # Gráfico de dispersión: Volumen vs Tiempo por Sede
         st.markdown("#### Análisis de Eficiencia: Volumen vs Tiempo Promedio")
-        fig_scatter = px.scatter(
-            df_funcionario_sede,
-            x="cantidad_casos",
-            y="tiempo_promedio_real",
-            size="tiempo_total_horas",
-            color="sede",
-            hover_name="funcionario_atendio",
-            hover_data=["sede", "cantidad_casos", "tiempo_promedio_real"],
-            labels={
-                "cantidad_casos": "Volumen de Atenciones",
-                "tiempo_promedio_real": "Tiempo Promedio (Minutos)",
-                "sede": "Sede",
-                "tiempo_total_horas": "Tiempo Total (Horas)"
-            },
-            title="Matriz de Productividad: Volumen vs Velocidad por Sede",
-        )
-        # Líneas promedio
-        mean_x = df_funcionario_sede["cantidad_casos"].mean()
-        mean_y = df_funcionario_sede["tiempo_promedio_real"].mean()
-        fig_scatter.add_hline(
-            y=mean_y, line_dash="dash", line_color="gray", annotation_text="Promedio Tiempo"
-        )
-        fig_scatter.add_vline(
-            x=mean_x, line_dash="dash", line_color="gray", annotation_text="Promedio Volumen"
-        )
+        fig_scatter = figura(grafico_productividad, df_funcionario_sede)
         st.plotly_chart(fig_scatter, use_container_width=True)
 
     # --- TAB 2: SERVICIOS SOLICITADOS ---
@@ -283,18 +533,15 @@ def run(project_info):
         st.markdown("Desglose completo de todos los servicios solicitados")
 
         # Análisis por servicio
-        df_servicios = (
-            df_filtrado.groupby("servicio")
-            .agg(
-                {
-                    "cantidad_casos": "sum",
-                    "tiempo_total_dedicado_num": "sum",
-                    "funcionario_atendio": "nunique",
-                    "sede": lambda x: ", ".join(x.unique()[:3]),
-                }
-            )
-            .reset_index()
+        df_servicios = df_filtrado.groupby("servicio").agg(
+            {
+                "cantidad_casos": "sum",
+                "tiempo_total_dedicado_num": "sum",
+                "funcionario_atendio": "nunique",
+            }
         )
+        df_servicios["sede"] = primeros_distintos(df_filtrado, "servicio", "sede", 3)
+        df_servicios = df_servicios.reset_index()
         df_servicios["tiempo_promedio"] = (
             df_servicios["tiempo_total_dedicado_num"] / df_servicios["cantidad_casos"]
         )
@@ -317,7 +564,8 @@ def run(project_info):
 
         # Gráfico de servicios
         st.markdown("#### Distribución de Servicios por Volumen")
-        fig_servicios = px.bar(
+        fig_servicios = figura(
+            px.bar,
             df_servicios.head(20),
             x="cantidad_casos",
             y="servicio",
@@ -330,19 +578,19 @@ def run(project_info):
                 "tiempo_promedio": "Tiempo Promedio (min)"
             },
             title="Top 20 Servicios por Volumen de Atenciones",
+            height=600,
         )
-        fig_servicios.update_layout(height=600)
         st.plotly_chart(fig_servicios, use_container_width=True)
 
         # Gráfico de torta: Distribución porcentual
         st.markdown("#### Distribución Porcentual de Servicios")
-        fig_pie_servicios = px.pie(
+        fig_pie_servicios = figura(
+            grafico_torta,
             df_servicios,
             values="cantidad_casos",
             names="servicio",
             title="Distribución de Atenciones por Tipo de Servicio",
         )
-        fig_pie_servicios.update_traces(textposition="inside", textinfo="percent+label")
         st.plotly_chart(fig_pie_servicios, use_container_width=True)
 
     # --- TAB 3: ANÁLISIS POR SEDE ---
@@ -387,7 +635,8 @@ def run(project_info):
         col1, col2 = st.columns(2)
 
         with col1:
-            fig_sede_casos = px.bar(
+            fig_sede_casos = figura(
+                px.bar,
                 df_sede,
                 x="sede",
                 y="cantidad_casos",
@@ -397,7 +646,8 @@ def run(project_info):
             st.plotly_chart(fig_sede_casos, use_container_width=True)
 
         with col2:
-            fig_sede_funcionarios = px.bar(
+            fig_sede_funcionarios = figura(
+                px.bar,
                 df_sede,
                 x="sede",
                 y="funcionario_atendio",
@@ -406,16 +656,16 @@ def run(project_info):
             )
             st.plotly_chart(fig_sede_funcionarios, use_container_width=True)
 
-        # Detalle por sede: Funcionarios en cada sede
+        # Detalle por sede: Funcionarios en cada sede (una sola agrupación para
+        # todas las sedes, que luego se reparte)
         st.markdown("#### Funcionarios por Sede")
-        for sede in df_sede["sede"].head(10):
+        df_funcionarios_sedes = (
+            df_filtrado.groupby(["sede", "funcionario_atendio"])
+            .agg({"cantidad_casos": "sum", "tiempo_total_dedicado_num": "sum"})
+        )
+        for sede in df_sede["sede"].head(sedes_detalle):
             st.markdown(f"**{sede}**")
-            df_sede_func = (
-                df_filtrado[df_filtrado["sede"] == sede]
-                .groupby("funcionario_atendio")
-                .agg({"cantidad_casos": "sum", "tiempo_total_dedicado_num": "sum"})
-                .reset_index()
-            )
+            df_sede_func = df_funcionarios_sedes.loc[sede].reset_index()
             df_sede_func["tiempo_promedio"] = (
                 df_sede_func["tiempo_total_dedicado_num"] / df_sede_func["cantidad_casos"]
             )
@@ -460,7 +710,8 @@ def run(project_info):
         display_area["Tiempo Total (hrs)"] = display_area["Tiempo Total (hrs)"].round(2)
         st.dataframe(display_area, use_container_width=True)
 
-        fig_area = px.bar(
+        fig_area = figura(
+            px.bar,
             df_area,
             x="area",
             y="tiempo_promedio",
@@ -485,13 +736,13 @@ def run(project_info):
             df_estado = (
                 df_filtrado.groupby("estado")["cantidad_casos"].sum().reset_index()
             )
-            fig_pie = px.pie(
+            fig_pie = figura(
+                grafico_torta,
                 df_estado,
                 values="cantidad_casos",
                 names="estado",
                 title="Distribución por Estado de Atención",
             )
-            fig_pie.update_traces(textposition="inside", textinfo="percent+label")
             st.plotly_chart(fig_pie, use_container_width=True)
 
         with col2:
@@ -504,7 +755,8 @@ def run(project_info):
                 df_poblacion["tiempo_total_dedicado_num"] / df_poblacion["cantidad_casos"]
             )
             df_poblacion = df_poblacion.sort_values("cantidad_casos", ascending=False).head(10)
-            fig_pob = px.bar(
+            fig_pob = figura(
+                px.bar,
                 df_poblacion,
                 x="cantidad_casos",
                 y="poblacion",
@@ -570,29 +822,44 @@ def run(project_info):
     st.markdown("---")
     st.subheader("Exportar Reportes")
 
-    # Preparar datos para exportación
-    export_data = {}
-    
-    # Limpiar columnas numéricas auxiliares para exportación
-    cols_to_export = [c for c in df_filtrado.columns if not c.endswith("_num")]
-    export_data["Datos Completos"] = df_filtrado[cols_to_export].copy()
-    
-    # Agregar hojas adicionales
-    if not df_funcionario_sede.empty:
-        export_data["Funcionarios por Sede"] = df_funcionario_sede.copy()
-    if not df_servicios.empty:
-        export_data["Servicios"] = df_servicios.copy()
-    if not df_sede.empty:
-        export_data["Resumen por Sede"] = df_sede.copy()
-    if not df_area.empty:
-        export_data["Resumen por Área"] = df_area.copy()
+    formato = st.radio(
+        "Formato", list(FORMATOS_EXPORTACION), horizontal=True, key="atenciones_formato"
+    )
+    file_name, mime = FORMATOS_EXPORTACION[formato]
+
+    # El reporte se genera solo cuando se pide y se guarda por combinación de filtros
+    reporte = reporte_guardado(df, filtros, formato)
+    if reporte is None:
+        generar = st.empty()
+        if generar.button(f"Generar Reporte Completo ({formato})"):
+            with st.spinner("Generando reporte..."):
+                export_data = hojas_reporte(
+                    df_filtrado, df_funcionario_sede, df_servicios, df_sede, df_area
+                )
+                # Se escribe en un archivo temporal y se lee una sola vez
+                with tempfile.TemporaryFile() as salida:
+                    if formato == "Excel":
+                        try:
+                            export_to_excel(export_data, salida)
+                        except ValueError as e:
+                            st.error(f"{e}. Exporta en formato Parquet o CSV.")
+                    elif formato == "Parquet":
+                        export_to_parquet(export_data, salida)
+                    else:
+                        export_to_csv_zip(export_data, salida)
+                    # Vacío si Excel rechazó el reporte antes de escribirlo
+                    if salida.tell():
+                        salida.seek(0)
+                        reporte = salida.read()
+            if reporte is not None:
+                guardar_reporte(df, filtros, formato, reporte)
+                generar.empty()
 
     # Botón de descarga
-    excel_data = export_to_excel(export_data, "reporte_atenciones.xlsx")
-    
-    st.download_button(
-        label="Descargar Reporte Completo (Excel)",
-        data=excel_data,
-        file_name="reporte_atenciones.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    if reporte is not None:
+        st.download_button(
+            label=f"Descargar Reporte Completo ({formato})",
+            data=reporte,
+            file_name=file_name,
+            mime=mime,
+        )
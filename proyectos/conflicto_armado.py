@@ -1,18 +1,277 @@
 import streamlit as st
 import pandas as pd
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+
+from utils.agregados import (
+    agregar_bloque,
+    agregar_csv_por_bloques,
+    anos,
+    combinar,
+    indexar,
+    materializar,
+    total,
+)
+from utils.cache_columnar import (
+    abrir_csv,
+    cargar_con_cache,
+    concatenar,
+    es_anexo,
+    estado_ingesta,
+)
+from utils.contexto import contexto_analisis
+from utils.figuras import estadisticas as estadisticas_figuras
+from utils.particiones import listar_particiones, tamano_datos
+from utils.registro_datos import estadisticas, obtener
+
+# Esquema de ingesta: columnas de pocos valores distintos se cargan como categorías
+COLUMNAS_CATEGORICAS = [
+    "origen_hecho",
+    "hecho_victimizante",
+    "presunto_responsable",
+    "genero",
+    "enfoque_diferencial",
+    "municipio_procede",
+    "barrio_procede",
+]
+FORMATO_FECHA = "%Y-%m-%d"
+
+# A partir de este tamaño el CSV se agrega por bloques sin cargarlo en memoria
+UMBRAL_STREAMING_MB = 1024
+
+
+def entero_compacto(serie, dtype):
+    """Convierte a un entero pequeño (nullable solo si hay valores faltantes)"""
+    try:
+        if serie.isna().any():
+            return serie.astype(dtype.capitalize())
+        return serie.astype(dtype)
+    except (TypeError, ValueError):
+        # Valores no enteros: conservar los decimales en un flotante compacto
+        return pd.to_numeric(serie, downcast="float")
+
+
+def memoria_mb(df):
+    """Memoria ocupada por el DataFrame en MB"""
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+
+def memoria_sin_esquema_mb(df):
+    """Estima la memoria que ocuparía el DataFrame con los tipos por defecto (object/float64)"""
+    total = df.memory_usage(deep=True, index=True)["Index"]
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            total += df[col].astype(object).memory_usage(deep=True, index=False)
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            total += len(df) * 8
+        else:
+            total += df[col].memory_usage(deep=True, index=False)
+    return total / 1024**2
 
 
-@st.cache_data
-def load_data(file_path):
-    """Carga los datos desde el CSV"""
-    df = pd.read_csv(file_path)
-    df["fecha_declaracion"] = pd.to_datetime(df["fecha_declaracion"])
-    df["ano_declara"] = df["fecha_declaracion"].dt.year
-    df["mes_declara"] = df["fecha_declaracion"].dt.month
+def esquema_csv(file_path):
+    """Tipos de columna a usar en pd.read_csv según las columnas del archivo"""
+    columnas = pd.read_csv(file_path, nrows=0).columns
+    return {col: "category" for col in COLUMNAS_CATEGORICAS if col in columnas}
+
+
+def preparar_datos(df):
+    """Interpreta la fecha, agrega año/mes y compacta los enteros"""
+    try:
+        df["fecha_declaracion"] = pd.to_datetime(
+            df["fecha_declaracion"], format=FORMATO_FECHA
+        )
+    except (ValueError, TypeError):
+        # El archivo no sigue el formato esperado: inferirlo
+        df["fecha_declaracion"] = pd.to_datetime(df["fecha_declaracion"])
+
+    df["ano_declara"] = entero_compacto(df["fecha_declaracion"].dt.year, "int16")
+    df["mes_declara"] = entero_compacto(df["fecha_declaracion"].dt.month, "int8")
+    if "edad" in df.columns:
+        df["edad"] = entero_compacto(df["edad"], "int16")
     return df
 
 
+def parse_csv(file_path, desde_byte=0, hasta_byte=None):
+    """
+    Lee el CSV con el esquema declarado y agrega las columnas derivadas de la fecha.
+
+    Con `desde_byte` solo se leen las filas a partir de esa posición, y con
+    `hasta_byte` solo las anteriores a esa otra.
+    """
+    with abrir_csv(file_path, desde_byte, hasta_byte) as (f, opciones):
+        df = pd.read_csv(f, dtype=esquema_csv(file_path), **opciones)
+    df = preparar_datos(df)
+    df.attrs["memoria_mb"] = {
+        "antes": round(memoria_sin_esquema_mb(df), 1),
+        "despues": round(memoria_mb(df), 1),
+    }
+    return df
+
+
+def combinar_datos(df, cola):
+    """Anexa las filas nuevas a los datos en caché y actualiza el reporte de memoria"""
+    antes = df.attrs.get("memoria_mb", {}).get("antes", 0) + cola.attrs.get(
+        "memoria_mb", {}
+    ).get("antes", 0)
+    combinado = concatenar(df, cola)
+    combinado.attrs["memoria_mb"] = {
+        "antes": round(antes, 1),
+        "despues": round(memoria_mb(combinado), 1),
+    }
+    return combinado
+
+
+def load_data(file_path):
+    """
+    Carga los datos desde el registro de datasets, o desde la caché columnar
+    en disco (o el CSV si cambió) cuando no están registrados.
+    """
+    return obtener(
+        "conflicto_armado.datos",
+        file_path,
+        lambda previo: cargar_con_cache(file_path, parse_csv, combinar_datos),
+    )
+
+
+def construir_cubo(file_path, streaming, previo=None, con_bosquejos=False):
+    """
+    Materializa el cubo que consultan los módulos.
+
+    En modo streaming el CSV se lee por bloques y nunca se carga completo;
+    en caso contrario se agregan los datos ya cargados (caché columnar).
+    Los bosquejos del modo aproximado solo se calculan con `con_bosquejos`.
+
+    Si `previo` es el cubo de una versión anterior del CSV y el archivo solo
+    recibió filas al final, se agregan únicamente esas filas y se combinan.
+    """
+    estado = estado_ingesta(file_path)
+    ingesta = previo.get("ingesta") if previo else None
+    anexo = ingesta is not None and es_anexo(file_path, ingesta["estado"])
+
+    if streaming:
+        nuevo = agregar_csv_por_bloques(
+            file_path,
+            preparar_datos,
+            desde_byte=ingesta["estado"]["tamano"] if anexo else 0,
+            con_bosquejos=con_bosquejos,
+            dtype=esquema_csv(file_path),
+        )
+        filas = None
+    else:
+        df = load_data(file_path)
+        filas = len(df)
+        nuevo = agregar_bloque(
+            df.iloc[ingesta["filas"] :] if anexo else df, con_bosquejos
+        )
+
+    cubo = dict(combinar([previo, nuevo]) if anexo else nuevo)
+    if not streaming:
+        cubo["memoria_mb"] = df.attrs.get("memoria_mb")
+
+    # Si el archivo cambió mientras se leía no se puede saber qué se agregó
+    if os.path.getsize(file_path) == estado["tamano"]:
+        cubo["ingesta"] = {"estado": estado, "filas": filas}
+    return cubo
+
+
+def cubo_particion(file_path, streaming, con_bosquejos=False):
+    """Cubo de una partición (se ejecuta en un proceso del pool)"""
+    if streaming:
+        return agregar_csv_por_bloques(
+            file_path,
+            preparar_datos,
+            con_bosquejos=con_bosquejos,
+            dtype=esquema_csv(file_path),
+        )
+    df = cargar_con_cache(file_path, parse_csv, combinar_datos)
+    cubo = agregar_bloque(df, con_bosquejos)
+    cubo["memoria_mb"] = df.attrs.get("memoria_mb")
+    return cubo
+
+
+def construir_cubo_particionado(directorio, streaming, anos=None, con_bosquejos=False):
+    """
+    Materializa el cubo de un directorio de particiones por año o mes.
+
+    Solo se leen las particiones de `anos` (todas si es None); cada una se
+    agrega en un proceso aparte y los cubos parciales se combinan.
+    """
+    rutas = listar_particiones(directorio, anos)
+    if not rutas:
+        raise FileNotFoundError(f"No hay particiones CSV en '{directorio}'")
+
+    cubos = None
+    if len(rutas) > 1:
+        try:
+            # "spawn" evita heredar los hilos del servidor de Streamlit en el fork
+            with ProcessPoolExecutor(
+                max_workers=min(len(rutas), os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as pool:
+                cubos = list(
+                    pool.map(
+                        cubo_particion,
+                        rutas,
+                        repeat(streaming),
+                        repeat(con_bosquejos),
+                    )
+                )
+        except BrokenProcessPool:
+            # Los procesos no pudieron iniciar (p. ej. el script principal no
+            # protege su ejecución con __main__): se agrega en este proceso
+            cubos = None
+    if cubos is None:
+        cubos = [cubo_particion(ruta, streaming, con_bosquejos) for ruta in rutas]
+
+    cubo = dict(combinar(cubos))
+    if not streaming:
+        cubo["memoria_mb"] = {
+            medida: round(sum(c["memoria_mb"][medida] for c in cubos), 1)
+            for medida in ["antes", "despues"]
+        }
+    return cubo
+
+
+def load_cube(file_path, streaming, anos=None, con_bosquejos=False):
+    """
+    Retorna el cubo del CSV (o del directorio de particiones) desde el registro
+    de datasets, compartido entre sesiones. El cubo es de solo lectura: los
+    módulos no deben modificar sus tablas (solo `utils.contexto` guarda en él
+    los contextos de análisis).
+
+    `anos` limita las particiones que se leen; no aplica a un CSV único.
+    `con_bosquejos` agrega los bosquejos del modo aproximado; es un cubo
+    distinto en el registro, así que el modo exacto no los calcula.
+    """
+    modo = "streaming" if streaming else "memoria"
+    if con_bosquejos:
+        modo += "_aproximado"
+    if os.path.isdir(file_path):
+        sufijo = "_".join(str(a) for a in anos) if anos else "todos"
+        return obtener(
+            f"conflicto_armado.cubo_{modo}_{sufijo}",
+            file_path,
+            lambda previo: indexar(
+                materializar(
+                    construir_cubo_particionado(
+                        file_path, streaming, anos, con_bosquejos
+                    )
+                )
+            ),
+        )
+    return obtener(
+        f"conflicto_armado.cubo_{modo}",
+        file_path,
+        lambda previo: indexar(
+            materializar(construir_cubo(file_path, streaming, previo, con_bosquejos))
+        ),
+    )
+
+
 def run(project_info):
     """Ejecuta el proyecto de conflicto armado"""
 
@@ -26,15 +285,23 @@ def run(project_info):
 
     if not os.path.exists(csv_path):
         st.error(
-            f"No se encontró el archivo '{csv_path}'. Por favor verifica que el archivo CSV existe en la carpeta data/"
+            f"No se encontró el archivo '{csv_path}'. Por favor verifica que el archivo CSV (o el directorio de particiones) existe en la carpeta data/"
         )
         st.stop()
 
-    df = load_data(csv_path)
-
-    # Filtrar datos por origen
-    df_intermunicipal = df[df["origen_hecho"] == "INTERMUNICIPAL"].copy()
-    df_intraurbano = df[df["origen_hecho"] == "INTRAURBANO"].copy()
+    streaming = (
+        project_info.get("modo_carga") == "streaming"
+        or tamano_datos(csv_path) > UMBRAL_STREAMING_MB * 1024**2
+    )
+    anos_config = project_info.get("anos")
+    aproximado = project_info.get("modo_aproximado", False)
+    cubo = load_cube(csv_path, streaming, anos_config, con_bosquejos=aproximado)
+    anos_analisis = anos_config or anos(cubo)
+    grupos_edad = project_info.get("grupos_edad")
+    contextos = {
+        origen: contexto_analisis(cubo, origen, anos_analisis, aproximado, grupos_edad)
+        for origen in ["INTERMUNICIPAL", "INTRAURBANO"]
+    }
 
     # Sidebar con información general
     with st.sidebar:
@@ -42,32 +309,68 @@ def run(project_info):
         st.subheader("Información del Dataset")
 
         st.write("**Totales por Origen**")
-        st.metric("Intermunicipal", f"{len(df_intermunicipal):,}")
-        st.metric("Intraurbano", f"{len(df_intraurbano):,}")
-        st.metric("Total General", f"{len(df):,}")
+        st.metric(
+            "Intermunicipal",
+            f"{contextos['INTERMUNICIPAL']['resumen']['personas']:,}",
+        )
+        st.metric("Intraurbano", f"{contextos['INTRAURBANO']['resumen']['personas']:,}")
+        st.metric("Total General", f"{total(cubo['hechos_mes']):,}")
 
         st.markdown("---")
 
-        st.write("**Intermunicipal por Año**")
-        inter_2024 = len(df_intermunicipal[df_intermunicipal["ano_declara"] == 2024])
-        inter_2025 = len(df_intermunicipal[df_intermunicipal["ano_declara"] == 2025])
-        st.write(f"2024: {inter_2024:,}")
-        st.write(f"2025: {inter_2025:,}")
+        for origen, titulo in [
+            ("INTERMUNICIPAL", "Intermunicipal"),
+            ("INTRAURBANO", "Intraurbano"),
+        ]:
+            st.write(f"**{titulo} por Año**")
+            for ano in anos_analisis:
+                personas = contextos[origen]["totales"][ano]["personas"]
+                st.write(f"{ano}: {personas:,}")
 
-        st.markdown("---")
+            st.markdown("---")
+
+        fechas = cubo["fechas"].iloc[0]
+        st.write("**Rango de Fechas**")
+        st.write(f"Desde: {fechas['desde'].strftime('%Y-%m-%d')}")
+        st.write(f"Hasta: {fechas['hasta'].strftime('%Y-%m-%d')}")
+
+        memoria = cubo.get("memoria_mb")
+        if memoria:
+            st.markdown("---")
+            st.write("**Memoria del Dataset**")
+            st.write(f"Sin esquema: {memoria['antes']:,.1f} MB")
+            st.write(f"Con esquema: {memoria['despues']:,.1f} MB")
+        elif streaming:
+            st.markdown("---")
+            st.caption("Modo streaming: el CSV se agrega por bloques")
+
+        registro = estadisticas()
+        st.caption(
+            f"Registro de datos: {registro['memoria_mb']:,.1f} de "
+            f"{registro['presupuesto_mb']:,.0f} MB | {registro['aciertos']} aciertos, "
+            f"{registro['fallos']} fallos, {registro['desalojos']} desalojos"
+        )
+        figuras = estadisticas_figuras()
+        st.caption(
+            f"Caché de figuras: {figuras['figuras']} figuras | "
+            f"{figuras['aciertos']} aciertos, {figuras['fallos']} fallos"
+        )
 
-        st.write("**Intraurbano por Año**")
-        intra_2024 = len(df_intraurbano[df_intraurbano["ano_declara"] == 2024])
-        intra_2025 = len(df_intraurbano[df_intraurbano["ano_declara"] == 2025])
-        st.write(f"2024: {intra_2024:,}")
-        st.write(f"2025: {intra_2025:,}")
+    tablero(project_info, cubo, anos_analisis)
 
-        st.markdown("---")
 
-        st.write("**Rango de Fechas**")
-        st.write(f"Desde: {df['fecha_declaracion'].min().strftime('%Y-%m-%d')}")
-        st.write(f"Hasta: {df['fecha_declaracion'].max().strftime('%Y-%m-%d')}")
+@st.fragment
+def tablero(project_info, cubo, anos_analisis):
+    """
+    Selector de origen, análisis y estadísticas generales.
 
+    Es un fragmento: cambiar el origen o el análisis vuelve a ejecutar solo
+    esta sección, no la restauración de sesión de main() ni la barra lateral.
+
+    Con "modo_aproximado" en la configuración, las declaraciones únicas se
+    estiman con bosquejos HyperLogLog y un interruptor recalcula los valores
+    exactos cuando se piden.
+    """
     # Selector principal de análisis
     st.header("Selecciona el tipo de análisis")
 
@@ -79,17 +382,33 @@ def run(project_info):
 
     # Determinar qué dataset usar
     if "INTERMUNICIPAL" in tipo_analisis:
-        df_seleccionado = df_intermunicipal.copy()
         tipo_texto = "INTERMUNICIPAL"
         ubicacion_texto = "Municipios fuera de Medellín"
     else:
-        df_seleccionado = df_intraurbano.copy()
         tipo_texto = "INTRAURBANO"
         ubicacion_texto = "Dentro de Medellín"
 
+    aproximado = project_info.get("modo_aproximado", False)
+    if aproximado:
+        aproximado = not st.toggle(
+            "Calcular valores exactos",
+            key="conflicto_exactos",
+            help="Cuenta las declaraciones únicas exactas en lugar de estimarlas",
+        )
+    contexto = contexto_analisis(
+        cubo, tipo_texto, anos_analisis, aproximado, project_info.get("grupos_edad")
+    )
+
     st.info(
-        f"**Filtro activo:** {tipo_texto} - {ubicacion_texto} | Total registros: {len(df_seleccionado):,}"
+        f"**Filtro activo:** {tipo_texto} - {ubicacion_texto} | Total registros: {contexto['resumen']['personas']:,}"
     )
+    if aproximado:
+        error = contexto["error"]
+        st.caption(
+            "Modo aproximado: las declaraciones únicas se estiman con HyperLogLog "
+            f"(error típico ±{error['declaraciones']:.1%} en totales y meses, "
+            f"±{error['ubicaciones']:.1%} por ubicación; el doble con 95% de confianza)"
+        )
 
     st.markdown("---")
 
@@ -110,58 +429,45 @@ def run(project_info):
         )
         st.stop()
 
-    # Crear tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
-        [
-            "Datos Generales",
-            "Por Municipios/Barrios",
-            "Hechos Victimizantes",
-            "Análisis Demográfico",
-            "Grupos Responsables (Todos)",
-            "Grupos (Solo Desplazamiento)",
-        ]
-    )
-
-    with tab1:
-        datos_generales.render(df_seleccionado, tipo_texto, ubicacion_texto)
-
-    with tab2:
-        analisis_municipios.render(df_seleccionado, tipo_texto, ubicacion_texto)
-
-    with tab3:
-        hechos_victimizantes.render(df_seleccionado, tipo_texto, ubicacion_texto)
-
-    with tab4:
-        analisis_demografico.render(df_seleccionado, tipo_texto, ubicacion_texto)
-
-    with tab5:
-        grupos_responsables_todos.render(df_seleccionado, tipo_texto, ubicacion_texto)
-
-    with tab6:
-        grupos_responsables_desplazamiento.render(
-            df_seleccionado, tipo_texto, ubicacion_texto
+    analisis = {
+        "Datos Generales": datos_generales,
+        "Por Municipios/Barrios": analisis_municipios,
+        "Hechos Victimizantes": hechos_victimizantes,
+        "Análisis Demográfico": analisis_demografico,
+        "Grupos Responsables (Todos)": grupos_responsables_todos,
+        "Grupos (Solo Desplazamiento)": grupos_responsables_desplazamiento,
+    }
+
+    if project_info.get("navegacion") == "pestanas":
+        # Todas las pestañas se calculan en cada interacción
+        for tab, modulo in zip(st.tabs(list(analisis)), analisis.values()):
+            with tab:
+                modulo.render(contexto, tipo_texto, ubicacion_texto)
+    else:
+        # Solo se calcula el análisis visible
+        seleccion = st.radio(
+            "Análisis:",
+            list(analisis),
+            horizontal=True,
+            key="conflicto_analisis",
+            label_visibility="collapsed",
         )
+        analisis[seleccion].render(contexto, tipo_texto, ubicacion_texto)
 
     # Footer
     st.markdown("---")
     st.markdown("### Estadísticas Generales")
 
+    resumen = contexto["resumen"]
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         if tipo_texto == "INTERMUNICIPAL":
-            st.metric(
-                "Total Municipios", df_seleccionado["municipio_procede"].nunique()
-            )
+            st.metric("Total Municipios", resumen["ubicaciones"])
         else:
-            st.metric("Total Barrios", df_seleccionado["barrio_procede"].nunique())
+            st.metric("Total Barrios", resumen["ubicaciones"])
     with col2:
-        st.metric(
-            "Grupos Identificados", df_seleccionado["presunto_responsable"].nunique()
-        )
+        st.metric("Grupos Identificados", resumen["grupos"])
     with col3:
-        st.metric(
-            "Hechos Victimizantes", df_seleccionado["hecho_victimizante"].nunique()
-        )
+        st.metric("Hechos Victimizantes", resumen["hechos"])
     with col4:
-        edad_promedio = df_seleccionado[df_seleccionado["edad"].notna()]["edad"].mean()
-        st.metric("Edad Promedio", f"{edad_promedio:.1f} años")
+        st.metric("Edad Promedio", f"{resumen['edad_promedio']:.1f} años")
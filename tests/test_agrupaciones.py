@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.agrupaciones import moda, primeros_distintos
+
+POR = [["funcionario", "sede"], "sede"]
+
+
+def datos_aleatorios(semilla, filas=300):
+    """Claves y valores con nulos, muchos grupos chicos y valores repetidos"""
+    rng = np.random.default_rng(semilla)
+
+    def columna(valores, nulos):
+        elegidos = rng.choice(valores, filas).astype(object)
+        elegidos[rng.random(filas) < nulos] = None
+        return elegidos
+
+    return pd.DataFrame(
+        {
+            "funcionario": columna([f"F{i}" for i in range(8)], 0.05),
+            "sede": columna([f"S{i}" for i in range(4)], 0.05),
+            "servicio": columna([f"Servicio {i}" for i in range(9)], 0.1),
+            "estado": columna(["Abierto", "Cerrado", "En trámite"], 0.15),
+        }
+    )
+
+
+def referencia_primeros(df, por, columna, k):
+    # La lambda que reemplaza primeros_distintos
+    return df.groupby(por)[columna].agg(
+        lambda x: ", ".join(str(s) for s in x.unique()[:k] if pd.notna(s))
+    )
+
+
+def referencia_moda(df, por, columna):
+    # La lambda que reemplaza moda; la original fallaba (IndexError) en grupos
+    # sin valores no nulos, que moda deja con ""
+    return df.groupby(por)[columna].agg(
+        lambda x: x.value_counts().index[0] if x.notna().any() else ""
+    )
+
+
+def empates(df, por, columna):
+    """Grupos en los que más de un valor tiene el conteo máximo"""
+    conteos = df.groupby(por)[columna].value_counts()
+    grupos = conteos.index.droplevel(-1)
+    maximos = conteos.groupby(grupos).transform("max")
+    return (conteos == maximos).groupby(grupos).sum() > 1
+
+
+@pytest.mark.parametrize("semilla", range(20))
+@pytest.mark.parametrize("por", POR)
+@pytest.mark.parametrize("k", [1, 3, 5])
+def test_primeros_distintos_igual_a_la_lambda(semilla, por, k):
+    df = datos_aleatorios(semilla)
+    pd.testing.assert_series_equal(
+        primeros_distintos(df, por, "servicio", k),
+        referencia_primeros(df, por, "servicio", k),
+    )
+
+
+@pytest.mark.parametrize("semilla", range(20))
+@pytest.mark.parametrize("por", POR)
+def test_moda_igual_a_la_lambda_sin_empates(semilla, por):
+    df = datos_aleatorios(semilla)
+    obtenido = moda(df, por, "estado")
+    esperado = referencia_moda(df, por, "estado")
+    pd.testing.assert_index_equal(obtenido.index, esperado.index)
+
+    sin_empate = ~empates(df, por, "estado").reindex(esperado.index, fill_value=False)
+    assert sin_empate.sum() > 0
+    pd.testing.assert_series_equal(obtenido[sin_empate], esperado[sin_empate])
+
+
+@pytest.mark.parametrize("semilla", range(20))
+@pytest.mark.parametrize("por", POR)
+def test_moda_en_empate_gana_el_primero(semilla, por):
+    df = datos_aleatorios(semilla)
+
+    def primero_entre_maximos(x):
+        conteos = x.value_counts()
+        if conteos.empty:
+            return ""
+        maximos = set(conteos.index[conteos == conteos.max()])
+        return next(valor for valor in x if valor in maximos)
+
+    pd.testing.assert_series_equal(
+        moda(df, por, "estado"),
+        df.groupby(por)["estado"].agg(primero_entre_maximos),
+    )
+
+
+def test_regla_de_empate():
+    df = pd.DataFrame(
+        {
+            "grupo": ["a", "a", "a", "a", "b", "b", "b", "c"],
+            "estado": ["Y", "X", "X", "Y", None, "Z", "W", None],
+        }
+    )
+    assert moda(df, "grupo", "estado").to_dict() == {"a": "Y", "b": "Z", "c": ""}
+
+
+def test_nulos_ocupan_un_lugar_de_los_primeros():
+    df = pd.DataFrame(
+        {
+            "grupo": ["a", "a", "a", None, "b"],
+            "servicio": [None, "S1", "S2", "S3", None],
+        }
+    )
+    resultado = primeros_distintos(df, "grupo", "servicio", 2)
+    assert resultado.to_dict() == {"a": "S1", "b": ""}
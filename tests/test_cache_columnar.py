@@ -0,0 +1,51 @@
+import pandas as pd
+
+from utils.cache_columnar import abrir_csv, cargar_con_cache
+
+
+def filas(desde, cantidad):
+    return "".join(f"{i},{i % 7}\n" for i in range(desde, desde + cantidad))
+
+
+def leer(file_path, desde_byte=0, hasta_byte=None):
+    with abrir_csv(file_path, desde_byte, hasta_byte) as (f, opciones):
+        return pd.read_csv(f, **opciones)
+
+
+def test_anexo_durante_la_lectura_no_se_duplica(tmp_path):
+    ruta = tmp_path / "datos.csv"
+    ruta.write_text("a,b\n" + filas(0, 1000))
+    anexado = []
+
+    def leer_mientras_se_anexa(file_path, **kwargs):
+        # El anexo llega después de tomar el tamaño y antes de terminar de leer
+        if not anexado:
+            anexado.append(True)
+            with open(file_path, "a") as f:
+                f.write(filas(1000, 1000))
+        return leer(file_path, **kwargs)
+
+    assert len(cargar_con_cache(str(ruta), leer_mientras_se_anexa)) == 1000
+
+    with open(ruta, "a") as f:
+        f.write(filas(2000, 1000))
+    df = cargar_con_cache(str(ruta), leer_mientras_se_anexa)
+    assert df["a"].tolist() == list(range(3000))
+
+
+def test_anexo_solo_lee_las_filas_nuevas(tmp_path):
+    ruta = tmp_path / "datos.csv"
+    ruta.write_text("a,b\n" + filas(0, 10))
+    lecturas = []
+
+    def registrar(file_path, **kwargs):
+        lecturas.append(kwargs.get("desde_byte", 0))
+        return leer(file_path, **kwargs)
+
+    cargar_con_cache(str(ruta), registrar)
+    tamano = ruta.stat().st_size
+    with open(ruta, "a") as f:
+        f.write(filas(10, 5))
+    df = cargar_con_cache(str(ruta), registrar)
+    assert lecturas == [0, tamano]
+    assert df["a"].tolist() == list(range(15))
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from proyectos.analisis_atenciones import (
+    parse_time_column_to_minutes,
+    parse_time_to_minutes,
+)
+
+VALORES = [
+    "01:30:00",
+    "00:00:30",
+    "125:59:59",
+    " 1:2:3 ",
+    "1 : 2 : 3",
+    "-1:30:00",
+    "+1:-30:+15",
+    "--1:00:00",
+    "1_0:00:00",
+    "1__0:00:00",
+    "_10:00:00",
+    "١:٢:٣",
+    "１２:００:００",
+    "1.5:00:00",
+    "1:00",
+    "1:00:00:00",
+    "::",
+    "",
+    "abc",
+    "nan",
+    None,
+    np.nan,
+]
+
+
+def comparar(serie):
+    esperado = serie.map(parse_time_to_minutes).astype(float)
+    obtenido = parse_time_column_to_minutes(serie)
+    pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+
+
+@pytest.mark.parametrize("valor", VALORES)
+def test_valor_igual_a_version_escalar(valor):
+    comparar(pd.Series([valor, "00:01:00"], dtype=object))
+
+
+def test_columna_mixta_con_repetidos():
+    valores = pd.Series(VALORES * 3, index=range(100, 100 + 3 * len(VALORES)))
+    comparar(valores)
+
+
+def test_columna_numerica():
+    comparar(pd.Series([1.0, np.nan, 3.0]))
+
+
+def test_columna_vacia():
+    comparar(pd.Series([], dtype=object))
+
+
+def test_resultado_conocido():
+    serie = pd.Series(["1_0:00:00", "١:٢:٣", "-1:30:00", None])
+    assert parse_time_column_to_minutes(serie).tolist() == [600.0, 62.05, -30.0, 0.0]
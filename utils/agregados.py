@@ -0,0 +1,682 @@
+"""
+Cubo agregado del proyecto de conflicto armado.
+
+Los módulos consultan un cubo materializado en lugar de recorrer las filas:
+una tabla de hechos con el número de personas por combinación de
+dimensiones, una tabla de declaraciones únicas (para conteos exactos de
+id_atencion) y la distribución de edades (para media y mediana exactas).
+Esas tablas son las que se combinan entre bloques; al terminar se derivan de
+ellas los cuboides, agregados sobre las pocas dimensiones que lee cada
+análisis, que son los que recorren las consultas (ver `materializar`).
+Para el modo aproximado guarda además bosquejos HyperLogLog de las
+declaraciones (utils.bosquejos), que estiman las declaraciones únicas sin
+recorrer la tabla de declaraciones; sin ese modo no se construyen.
+
+El cubo se construye por bloques y los bloques se combinan, de modo que
+puede calcularse sobre el DataFrame completo o leyendo el CSV por partes
+sin cargarlo en memoria.
+"""
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils import bosquejos
+from utils.cache_columnar import abrir_csv
+
+HECHO_DESPLAZAMIENTO = "Desplazamiento forzado"
+TAMANO_BLOQUE = 500_000
+
+# Grupos de edad por defecto: intervalos (límite anterior, límite], como pd.cut.
+# Los grupos se derivan de la distribución de edades del cubo (ver
+# `histograma_edad`), así que cambiar los límites no reconstruye el cubo
+BINS_EDAD = [0, 17, 28, 40, 60, 150]
+ETIQUETAS_EDAD = ["0-17", "18-28", "29-40", "41-60", "60+"]
+
+# `ubicacion` es el municipio para INTERMUNICIPAL y el barrio para INTRAURBANO
+DIMENSIONES = [
+    "origen_hecho",
+    "ano_declara",
+    "mes_declara",
+    "hecho_victimizante",
+    "presunto_responsable",
+    "ubicacion",
+    "genero",
+    "enfoque_diferencial",
+]
+MEDIDAS = ["personas", "documentos"]
+
+# Dimensiones sobre las que se pueden contar declaraciones únicas exactas
+DIMENSIONES_DECLARACIONES = [
+    "origen_hecho",
+    "ano_declara",
+    "mes_declara",
+    "hecho_victimizante",
+    "ubicacion",
+]
+DIMENSIONES_EDAD = ["origen_hecho", "ano_declara", "edad"]
+
+# Cuboides de `hechos`: personas y documentos sobre las dimensiones que lee
+# cada análisis. `hechos` cruza todas las dimensiones y casi no agrupa filas;
+# cada cuboide tiene una fracción de sus celdas
+CUBOIDES = {
+    "hechos_mes": [
+        "origen_hecho",
+        "ano_declara",
+        "mes_declara",
+        "hecho_victimizante",
+    ],
+    "hechos_responsable": [
+        "origen_hecho",
+        "ano_declara",
+        "hecho_victimizante",
+        "presunto_responsable",
+    ],
+    "hechos_ubicacion": ["origen_hecho", "ano_declara", "ubicacion"],
+    "hechos_demografia": [
+        "origen_hecho",
+        "ano_declara",
+        "genero",
+        "enfoque_diferencial",
+    ],
+}
+# Cuboides de declaraciones únicas (exactas) por celda, en total y solo de
+# desplazamiento. No se pueden sumar entre celdas: cada uno responde una
+# consulta por origen
+CUBOIDES_DECLARACIONES = {
+    "declaraciones_mes": ["origen_hecho", "ano_declara", "mes_declara"],
+    "declaraciones_ano": ["origen_hecho", "ano_declara"],
+    "declaraciones_ubicacion": ["origen_hecho", "ano_declara", "ubicacion"],
+}
+
+# Tablas de bosquejos HyperLogLog: dimensiones de cada celda y precisión p
+# (2**p registros; error típico 3.3% con p=10 y 6.5% con p=8)
+BOSQUEJOS = {
+    "bosquejos": (
+        ["origen_hecho", "ano_declara", "mes_declara", "hecho_victimizante"],
+        10,
+    ),
+    "bosquejos_ubicacion": (["origen_hecho", "ano_declara", "ubicacion"], 8),
+}
+
+# Tablas del cubo con filas por origen y año (cuboides y bosquejos, si los hay)
+TABLAS = [
+    "hechos",
+    "declaraciones",
+    "edades",
+    *CUBOIDES,
+    *CUBOIDES_DECLARACIONES,
+    *BOSQUEJOS,
+]
+CLAVES_INDICE = ["origen_hecho", "ano_declara"]
+
+# Máscaras de igualdad ya calculadas, por tabla (ver `mascara`)
+_mascaras = {}
+
+
+def _bosquejo(declaraciones, dimensiones, precision):
+    # Registros HyperLogLog de los id_atencion de cada celda de `dimensiones`
+    validas = declaraciones[declaraciones["id_atencion"].notna()]
+    grupos = validas.groupby(dimensiones, observed=True, dropna=False)
+    claves = grupos.size().index.to_frame(index=False)
+    registros = bosquejos.registros(
+        validas["id_atencion"].to_numpy(),
+        grupos.ngroup().to_numpy(),
+        len(claves),
+        precision,
+    )
+    return pd.concat(
+        [claves, pd.DataFrame(registros, columns=bosquejos.columnas(precision))],
+        axis=1,
+    )
+
+
+def _tablas(cubo):
+    # Tablas de TABLAS presentes en el cubo
+    return [nombre for nombre in TABLAS if nombre in cubo]
+
+
+def agregar_bloque(df, con_bosquejos=False):
+    """
+    Calcula el cubo parcial de un bloque de filas. Las tablas de bosquejos
+    (BOSQUEJOS) solo se calculan con `con_bosquejos`.
+    """
+    es_intermunicipal = df["origen_hecho"] == "INTERMUNICIPAL"
+    df = df.assign(
+        ubicacion=df["municipio_procede"]
+        .astype(object)
+        .where(es_intermunicipal, df["barrio_procede"].astype(object))
+        .astype("category"),
+        _documento=df["documento_anonimizado"].notna(),
+    )
+
+    hechos = (
+        df.groupby(DIMENSIONES, observed=True, dropna=False)
+        .agg(personas=("_documento", "size"), documentos=("_documento", "sum"))
+        .reset_index()
+    )
+    declaraciones = (
+        df[DIMENSIONES_DECLARACIONES + ["id_atencion"]]
+        .drop_duplicates()
+        .reset_index(drop=True)
+    )
+    edades = (
+        df[df["edad"].notna()]
+        .groupby(DIMENSIONES_EDAD, observed=True, dropna=False)
+        .size()
+        .reset_index(name="personas")
+    )
+    fechas = pd.DataFrame(
+        {
+            "desde": [df["fecha_declaracion"].min()],
+            "hasta": [df["fecha_declaracion"].max()],
+        }
+    )
+    cubo = {
+        "hechos": hechos,
+        "declaraciones": declaraciones,
+        "edades": edades,
+        "fechas": fechas,
+    }
+    if con_bosquejos:
+        for nombre, (dimensiones, precision) in BOSQUEJOS.items():
+            cubo[nombre] = _bosquejo(declaraciones, dimensiones, precision)
+    return cubo
+
+
+def combinar(partes):
+    """Combina cubos parciales (de bloques o particiones) en uno solo"""
+    partes = [p for p in partes if p is not None]
+    if len(partes) == 1:
+        return partes[0]
+
+    hechos = (
+        pd.concat([p["hechos"] for p in partes], ignore_index=True)
+        .groupby(DIMENSIONES, observed=True, dropna=False)[MEDIDAS]
+        .sum()
+        .reset_index()
+    )
+    declaraciones = (
+        pd.concat([p["declaraciones"] for p in partes], ignore_index=True)
+        .drop_duplicates()
+        .reset_index(drop=True)
+    )
+    edades = (
+        pd.concat([p["edades"] for p in partes], ignore_index=True)
+        .groupby(DIMENSIONES_EDAD, observed=True, dropna=False)["personas"]
+        .sum()
+        .reset_index()
+    )
+    fechas = pd.concat([p["fechas"] for p in partes], ignore_index=True)
+    # La unión de bosquejos es el máximo de cada registro
+    combinados = {
+        nombre: pd.concat([p[nombre] for p in partes], ignore_index=True)
+        .groupby(dimensiones, observed=True, dropna=False)
+        .max()
+        .reset_index()
+        for nombre, (dimensiones, _) in BOSQUEJOS.items()
+        if all(nombre in p for p in partes)
+    }
+    return {
+        "hechos": hechos,
+        "declaraciones": declaraciones,
+        "edades": edades,
+        "fechas": pd.DataFrame(
+            {"desde": [fechas["desde"].min()], "hasta": [fechas["hasta"].max()]}
+        ),
+        **combinados,
+    }
+
+
+def agregar_csv_por_bloques(
+    file_path,
+    preparar,
+    tamano_bloque=TAMANO_BLOQUE,
+    desde_byte=0,
+    con_bosquejos=False,
+    **kwargs,
+):
+    """
+    Construye el cubo leyendo el CSV por bloques, sin cargarlo completo.
+
+    Args:
+        file_path: Ruta del CSV
+        preparar: Función que recibe un bloque crudo y agrega las columnas derivadas
+        tamano_bloque: Filas por bloque
+        desde_byte: Posición desde la que leer (para agregar solo filas anexadas)
+        con_bosquejos: Calcular también las tablas de bosquejos (modo aproximado)
+        **kwargs: Argumentos adicionales para pd.read_csv (p. ej. dtype)
+    """
+    # Cubos pendientes con su nivel, como un contador binario: dos cubos del
+    # mismo nivel se combinan en uno del nivel siguiente, de modo que cada
+    # celda se reagrega O(log n) veces y no una vez por cada bloque posterior
+    pendientes = []
+    with abrir_csv(file_path, desde_byte) as (f, opciones):
+        for bloque in pd.read_csv(f, chunksize=tamano_bloque, **opciones, **kwargs):
+            parcial, nivel = agregar_bloque(preparar(bloque), con_bosquejos), 0
+            while pendientes and pendientes[-1][0] == nivel:
+                parcial = combinar([pendientes.pop()[1], parcial])
+                nivel += 1
+            pendientes.append((nivel, parcial))
+    return combinar([cubo for _, cubo in pendientes]) if pendientes else None
+
+
+def materializar(cubo):
+    """
+    Agrega al cubo combinado sus cuboides (CUBOIDES y CUBOIDES_DECLARACIONES).
+    Se calculan una vez por versión de los datos, después de combinar bloques
+    o particiones, y son las tablas que consultan los análisis.
+    """
+    materializado = dict(cubo)
+    hechos = cubo["hechos"]
+    for nombre, dimensiones in CUBOIDES.items():
+        materializado[nombre] = (
+            hechos.groupby(dimensiones, observed=True, dropna=False)[MEDIDAS]
+            .sum()
+            .reset_index()
+        )
+
+    # Los id que no son de desplazamiento quedan nulos y nunique los ignora
+    declaraciones = cubo["declaraciones"]
+    ids = declaraciones["id_atencion"]
+    ids = pd.DataFrame(
+        {
+            "declaraciones": ids,
+            "declaraciones_desplazamiento": ids.where(
+                mascara(declaraciones, hecho_victimizante=HECHO_DESPLAZAMIENTO)
+            ),
+        }
+    )
+    for nombre, dimensiones in CUBOIDES_DECLARACIONES.items():
+        materializado[nombre] = (
+            ids.groupby(
+                [declaraciones[c] for c in dimensiones], observed=True, dropna=False
+            )
+            .nunique()
+            .reset_index()
+        )
+    return materializado
+
+
+def indexar(cubo):
+    """
+    Ordena las tablas del cubo por origen y año y registra, para cada par
+    (origen, año), el rango de filas que ocupa. `filtrar_origen`, `por_ano` y
+    `anos` requieren el índice: toman rebanadas contiguas en lugar de recorrer
+    las tablas. `load_cube` siempre retorna el cubo indexado.
+    """
+    indexado = dict(cubo)
+    indice = {}
+    for nombre in _tablas(cubo):
+        tabla = (
+            cubo[nombre]
+            .sort_values(CLAVES_INDICE, kind="stable")
+            .reset_index(drop=True)
+        )
+        grupos = tabla.groupby(
+            CLAVES_INDICE, observed=True, dropna=False, sort=False
+        ).indices
+        indice[nombre] = {
+            clave: (int(posiciones[0]), int(posiciones[-1]) + 1)
+            for clave, posiciones in grupos.items()
+        }
+        indexado[nombre] = tabla
+    indexado["indice"] = indice
+    # Los contextos de análisis (utils.contexto) apuntan a las tablas anteriores
+    indexado.pop("contextos", None)
+    return indexado
+
+
+def _rebanar(cubo, condicion):
+    # Restringe el cubo a los pares (origen, año) que cumplen la condición,
+    # recalculando los rangos del índice sobre las tablas resultantes. Los
+    # rangos contiguos se toman como una sola rebanada (una vista, sin copia)
+    resultado = dict(cubo)
+    indice = {}
+    for nombre in _tablas(cubo):
+        rangos = sorted(
+            (rango, clave)
+            for clave, rango in cubo["indice"][nombre].items()
+            if condicion(*clave)
+        )
+        tramos, indice[nombre], inicio = [], {}, 0
+        for (desde, hasta), clave in rangos:
+            if tramos and tramos[-1][1] == desde:
+                tramos[-1][1] = hasta
+            else:
+                tramos.append([desde, hasta])
+            indice[nombre][clave] = (inicio, inicio + hasta - desde)
+            inicio += hasta - desde
+        partes = [cubo[nombre].iloc[desde:hasta] for desde, hasta in tramos]
+        if len(partes) == 1:
+            resultado[nombre] = partes[0]
+        elif partes:
+            resultado[nombre] = pd.concat(partes, ignore_index=True)
+        else:
+            resultado[nombre] = cubo[nombre].iloc[0:0]
+    resultado["indice"] = indice
+    return resultado
+
+
+def filtrar_origen(cubo, origen):
+    """Restringe todas las tablas de un cubo indexado a un origen del hecho"""
+    return _rebanar(cubo, lambda o, ano: o == origen)
+
+
+def por_ano(cubo, ano):
+    """Restringe todas las tablas de un cubo indexado a un año de declaración"""
+    return _rebanar(cubo, lambda o, a: a == ano)
+
+
+def anos(cubo):
+    """Años de declaración presentes en un cubo indexado, ordenados"""
+    return sorted({int(a) for _, a in cubo["indice"]["hechos"] if not pd.isna(a)})
+
+
+def _mascara_igualdad(tabla, columna, valor):
+    llave = (id(tabla), columna, valor)
+    entrada = _mascaras.get(llave)
+    if entrada is not None and entrada[0]() is tabla:
+        return entrada[1]
+    mascara = (tabla[columna] == valor).to_numpy(dtype=bool, na_value=False)
+    mascara.flags.writeable = False
+    # La máscara se descarta cuando la tabla deja de existir
+    referencia = weakref.ref(tabla, lambda _, llave=llave: _mascaras.pop(llave, None))
+    _mascaras[llave] = (referencia, mascara)
+    return mascara
+
+
+def mascara(tabla, **filtros):
+    """
+    Máscara booleana de las celdas que cumplen las igualdades (columna=valor),
+    o None si no hay filtros. Las máscaras de cada igualdad se guardan por
+    tabla, de modo que las consultas repetidas no vuelven a recorrerla.
+    """
+    resultado = None
+    for columna, valor in filtros.items():
+        igualdad = _mascara_igualdad(tabla, columna, valor)
+        resultado = igualdad if resultado is None else resultado & igualdad
+    return resultado
+
+
+def _columna(tabla, columna, mascara):
+    # Solo se copia la columna consultada, nunca la tabla completa
+    serie = tabla[columna]
+    return serie if mascara is None else serie[mascara]
+
+
+def total(tabla, medida="personas", **filtros):
+    """Suma de una medida sobre las celdas filtradas"""
+    valores = tabla[medida].to_numpy()
+    seleccion = mascara(tabla, **filtros)
+    return int(valores.sum() if seleccion is None else valores.sum(where=seleccion))
+
+
+def conteo(tabla, por, medida="personas", **filtros):
+    """Suma de una medida por los valores no nulos de `por`"""
+    seleccion = mascara(tabla, **filtros)
+    return (
+        _columna(tabla, medida, seleccion)
+        .groupby(_columna(tabla, por, seleccion), observed=True)
+        .sum()
+    )
+
+
+def _codigos(serie):
+    # Códigos enteros (nulos = -1) y valores ordenados. Las categorías ya los
+    # tienen; los enteros de rango corto (años, id) se desplazan sin hashing
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    if isinstance(serie.dtype, np.dtype) and serie.dtype.kind in "iu" and len(serie):
+        minimo, maximo = int(serie.min()), int(serie.max())
+        if maximo - minimo <= len(serie):
+            codigos = serie.to_numpy().astype(np.int64) - minimo
+            return codigos, pd.RangeIndex(minimo, maximo + 1)
+    return pd.factorize(serie, sort=True)
+
+
+def _seleccionar(conteos, k):
+    # Posiciones de los k mayores conteos positivos, de mayor a menor y los
+    # empates en orden de valor (como un sort estable); sin ordenar el resto
+    posiciones = np.flatnonzero(conteos > 0)
+    if k is not None and len(posiciones) > k:
+        valores = conteos[posiciones]
+        umbral = np.partition(valores, len(valores) - k)[len(valores) - k]
+        mayores = posiciones[valores > umbral]
+        iguales = posiciones[valores == umbral][: k - len(mayores)]
+        posiciones = np.concatenate([mayores, iguales])
+    return posiciones[np.lexsort((posiciones, -conteos[posiciones]))]
+
+
+def _rankings(tabla, columna, k, medida, por, claves, filtros):
+    # Un solo bincount sobre las celdas (valor de `por`, valor de `columna`)
+    # y el top de cada fila
+    codigos, valores = _codigos(tabla[columna])
+    validos = codigos >= 0
+    seleccion = mascara(tabla, **filtros)
+    if seleccion is not None:
+        validos &= seleccion
+    if por is None:
+        grupos, claves_por = np.zeros(len(codigos), dtype=np.int64), [None]
+    else:
+        grupos, claves_por = _codigos(tabla[por])
+        claves_por = claves_por.tolist()
+        validos &= grupos >= 0
+
+    celdas = grupos[validos].astype(np.int64) * len(valores) + codigos[validos]
+    tamano = len(claves_por) * len(valores)
+    pesos = tabla[medida].to_numpy()[validos]
+    conteos = np.rint(np.bincount(celdas, weights=pesos, minlength=tamano))
+    conteos = conteos.astype(np.int64).reshape(len(claves_por), len(valores))
+
+    resultado = {}
+    for fila, clave in zip(conteos, claves_por):
+        posiciones = _seleccionar(fila, k)
+        resultado[clave] = pd.Series(
+            fila[posiciones],
+            index=pd.Index(valores.take(posiciones), name=columna),
+            name=medida,
+        )
+    if por is None:
+        return resultado[None]
+    for clave in claves or []:
+        if clave not in resultado:
+            resultado[clave] = pd.Series(
+                [],
+                index=pd.Index(valores[:0], name=columna),
+                dtype=np.int64,
+                name=medida,
+            )
+    return resultado
+
+
+def top_k(tabla, columna, k, medida="personas", por=None, claves=None, **filtros):
+    """
+    Los k valores de `columna` con mayor suma de `medida`, de mayor a menor
+    (como `conteo(...)` ordenado y `.head(k)`), sin ordenar los demás; con
+    k=None, todos.
+
+    Con `por` (p. ej. "ano_declara") calcula en la misma pasada el top de cada
+    valor de esa columna y retorna {valor: Series}; los valores de `claves`
+    que no aparecen quedan con un top vacío.
+    """
+    return _rankings(tabla, columna, k, medida, por, claves, filtros)
+
+
+def distintos_aproximados(tabla, por, **filtros):
+    """
+    Estimación de `distintos` con una tabla de bosquejos (ver BOSQUEJOS): une
+    los registros de las celdas de cada valor de `por` y estima la unión.
+    """
+    seleccion = mascara(tabla, **filtros)
+    tabla = tabla if seleccion is None else tabla[seleccion]
+    union = tabla.groupby(por, observed=True)[bosquejos.columnas_registros(tabla)].max()
+    estimados = np.rint(bosquejos.estimar(union.to_numpy())).astype(np.int64)
+    return pd.Series(estimados, index=union.index, name="id_atencion")
+
+
+def error_aproximado(nombre):
+    """Error relativo típico de las estimaciones con una tabla de bosquejos"""
+    return bosquejos.error_relativo(BOSQUEJOS[nombre][1])
+
+
+def resumen_mensual(cubo, aproximado=False):
+    """
+    Personas y declaraciones por año y mes, en total y solo de desplazamiento.
+
+    Cada tabla se agrupa una sola vez por (ano_declara, mes_declara) para todos
+    los años del cubo. Retorna (mensual, anual): `mensual` tiene una fila por
+    año y mes no nulo; `anual`, indexado por año, incluye las filas sin mes.
+    Con `aproximado`, las declaraciones se estiman con los bosquejos.
+
+    `cubo` es el de un solo origen (ver `filtrar_origen`) y con sus cuboides
+    (ver `materializar`): las declaraciones únicas de cada celda no se suman
+    entre orígenes.
+    """
+    hechos = cubo["hechos_mes"]
+    claves = ["ano_declara", "mes_declara"]
+
+    personas = hechos["personas"].to_numpy()
+    medidas = pd.DataFrame(
+        {
+            "personas": personas,
+            "documentos": hechos["documentos"].to_numpy(),
+            "personas_desplazamiento": np.where(
+                mascara(hechos, hecho_victimizante=HECHO_DESPLAZAMIENTO), personas, 0
+            ),
+        },
+        index=hechos.index,
+    )
+    por_mes = medidas.groupby(
+        [hechos[c] for c in claves], observed=True, dropna=False
+    ).sum()
+
+    if aproximado:
+        ids_mes, ids_ano = _declaraciones_aproximadas(cubo["bosquejos"], claves)
+    else:
+        ids_mes, ids_ano = _declaraciones_exactas(cubo, claves)
+
+    anual = (
+        por_mes[["personas", "personas_desplazamiento"]]
+        .groupby(level="ano_declara")
+        .sum()
+        .join(ids_ano, how="outer")
+        .fillna(0)
+        .astype(int)
+    )
+    mensual = (
+        por_mes.join(ids_mes, how="left")
+        .fillna({"declaraciones": 0, "declaraciones_desplazamiento": 0})
+        .astype(int)
+        .reset_index()
+    )
+    mensual = mensual[mensual["mes_declara"].notna()].reset_index(drop=True)
+    return mensual, anual
+
+
+def _declaraciones_exactas(cubo, claves):
+    # Cada celda de los cuboides ya tiene sus declaraciones únicas; con un
+    # solo origen hay una celda por mes o por año
+    columnas = ["declaraciones", "declaraciones_desplazamiento"]
+    por_mes, por_ano = cubo["declaraciones_mes"], cubo["declaraciones_ano"]
+    ids_mes = por_mes.groupby(
+        [por_mes[c] for c in claves], observed=True, dropna=False
+    )[columnas].sum()
+    ids_ano = por_ano.groupby("ano_declara", observed=True)[columnas].sum()
+    return ids_mes, ids_ano
+
+
+def _declaraciones_aproximadas(tabla, claves):
+    def estimar(por):
+        return pd.DataFrame(
+            {
+                "declaraciones": distintos_aproximados(tabla, por),
+                "declaraciones_desplazamiento": distintos_aproximados(
+                    tabla, por, hecho_victimizante=HECHO_DESPLAZAMIENTO
+                ),
+            }
+        )
+
+    return estimar(claves), estimar("ano_declara")
+
+
+def valores_distintos(tabla, columna):
+    """Cantidad de valores no nulos distintos de una columna (como nunique)"""
+    return int(tabla[columna].dropna().nunique())
+
+
+def distribucion_edad(tabla_edades, **filtros):
+    """Edades con su cantidad de personas, ordenadas, sin edades nulas"""
+    return conteo(tabla_edades, "edad", **filtros).sort_index()
+
+
+def grupos_edad(edades, limites=BINS_EDAD, etiquetas=ETIQUETAS_EDAD):
+    """
+    Grupo de edad de cada edad como categoría ordenada, con intervalos
+    (límite anterior, límite] como pd.cut; fuera de los límites queda nulo.
+    """
+    edades = np.asarray(edades, dtype=float)
+    codigos = np.searchsorted(limites, edades, side="left") - 1
+    codigos[(codigos >= len(etiquetas)) | np.isnan(edades)] = -1
+    return pd.Categorical.from_codes(codigos, categories=etiquetas, ordered=True)
+
+
+def histograma_edad(
+    tabla_edades,
+    por="ano_declara",
+    claves=None,
+    limites=BINS_EDAD,
+    etiquetas=ETIQUETAS_EDAD,
+    **filtros,
+):
+    """
+    Personas por grupo de edad para cada valor de `por`, en una sola pasada
+    (un bincount sobre las celdas valor × grupo). Retorna un DataFrame con una
+    fila por valor de `por` (o de `claves`, con ceros si faltan) y una columna
+    por grupo, en el orden de `etiquetas`.
+    """
+    seleccion = mascara(tabla_edades, **filtros)
+    grupos = grupos_edad(
+        _columna(tabla_edades, "edad", seleccion), limites, etiquetas
+    ).codes
+    codigos, valores = _codigos(_columna(tabla_edades, por, seleccion))
+    validos = (grupos >= 0) & (codigos >= 0)
+    celdas = codigos[validos].astype(np.int64) * len(etiquetas) + grupos[validos]
+    conteos = np.bincount(
+        celdas,
+        weights=_columna(tabla_edades, "personas", seleccion).to_numpy()[validos],
+        minlength=len(valores) * len(etiquetas),
+    )
+    histograma = pd.DataFrame(
+        np.rint(conteos).astype(np.int64).reshape(len(valores), len(etiquetas)),
+        index=pd.Index(valores, name=por),
+        columns=pd.CategoricalIndex(
+            etiquetas, categories=etiquetas, ordered=True, name="grupo_edad"
+        ),
+    )
+    if claves is not None:
+        histograma = histograma.reindex(claves, fill_value=0)
+    return histograma
+
+
+def media_edad(distribucion):
+    """Media ponderada de una distribución de edades"""
+    if distribucion.sum() == 0:
+        return np.nan
+    return float(
+        (distribucion.index.to_numpy(dtype=float) * distribucion.to_numpy()).sum()
+        / distribucion.sum()
+    )
+
+
+def mediana_edad(distribucion):
+    """Mediana exacta de una distribución de edades (como Series.median)"""
+    n = int(distribucion.sum())
+    if n == 0:
+        return np.nan
+    edades = distribucion.index.to_numpy(dtype=float)
+    acumulado = np.cumsum(distribucion.to_numpy())
+    bajo = edades[np.searchsorted(acumulado, (n - 1) // 2, side="right")]
+    alto = edades[np.searchsorted(acumulado, n // 2, side="right")]
+    return (bajo + alto) / 2
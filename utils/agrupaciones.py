@@ -0,0 +1,80 @@
+"""
+Agregaciones por grupo sin funciones de Python por grupo.
+
+`primeros_distintos` y `moda` reemplazan a las lambdas habituales en
+`groupby().agg` (unir los primeros valores únicos, tomar el valor más
+frecuente): trabajan sobre códigos enteros de grupos y valores, con el mismo
+resultado y en el orden de grupos de `df.groupby(por)`.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _grupos(df, por):
+    # Código de grupo de cada fila (-1 si la clave es nula, como groupby) y
+    # las claves de los grupos, ordenadas como en df.groupby(por)
+    agrupado = df.groupby(por, sort=True)
+    codigos = agrupado.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return codigos, agrupado.size().index
+
+
+def primeros_distintos(df, por, columna, k, separador=", "):
+    """
+    Por grupo, los primeros k valores distintos de `columna` en orden de
+    aparición, como texto unido por `separador`. Equivale a
+    `", ".join(str(s) for s in x.unique()[:k] if pd.notna(s))`: un nulo
+    ocupa uno de los k lugares pero no se muestra.
+    """
+    grupos, claves = _grupos(df, por)
+    codigos, unicos = pd.factorize(df[columna], use_na_sentinel=False)
+    textos = np.array([str(valor) for valor in unicos], dtype=object)
+    nulos = np.asarray(pd.isna(unicos), dtype=bool)
+
+    # Primera aparición de cada valor en su grupo, en el orden de las filas
+    pares = pd.DataFrame({"grupo": grupos, "valor": codigos})
+    pares = pares[pares["grupo"] >= 0].drop_duplicates()
+    lugar = pares.groupby("grupo", sort=False).cumcount().to_numpy()
+    grupo = pares["grupo"].to_numpy()
+    valor = pares["valor"].to_numpy()
+    mostrar = (lugar < k) & ~nulos[valor]
+
+    # Se agrega un lugar a la vez: k pasadas sobre los grupos
+    resultado = np.full(len(claves), "", dtype=object)
+    vacio = np.ones(len(claves), dtype=bool)
+    for j in range(k):
+        seleccion = mostrar & (lugar == j)
+        filas, texto = grupo[seleccion], textos[valor[seleccion]]
+        continuar = ~vacio[filas]
+        resultado[filas[continuar]] = (
+            resultado[filas[continuar]] + separador + texto[continuar]
+        )
+        resultado[filas[~continuar]] = texto[~continuar]
+        vacio[filas] = False
+    return pd.Series(resultado, index=claves, name=columna)
+
+
+def moda(df, por, columna, vacio=""):
+    """
+    Por grupo, el valor más frecuente de `columna`, sin contar nulos; en un
+    empate, el que aparece primero (como `x.value_counts().index[0]`). Los
+    grupos sin valores no nulos quedan con `vacio`.
+    """
+    grupos, claves = _grupos(df, por)
+    codigos, unicos = pd.factorize(df[columna])
+    validas = np.flatnonzero((grupos >= 0) & (codigos >= 0))
+
+    pares = pd.DataFrame(
+        {"grupo": grupos[validas], "valor": codigos[validas], "fila": validas}
+    )
+    conteos = pares.groupby(["grupo", "valor"], sort=False)["fila"].agg(["size", "min"])
+    grupo = conteos.index.get_level_values("grupo").to_numpy()
+    valor = conteos.index.get_level_values("valor").to_numpy()
+    # Por grupo: mayor conteo primero y, a igual conteo, primera aparición
+    orden = np.lexsort((conteos["min"].to_numpy(), -conteos["size"].to_numpy(), grupo))
+    cambios = grupo[orden][1:] != grupo[orden][:-1]
+    primeros = orden[np.r_[True, cambios]] if len(orden) else orden
+
+    resultado = np.full(len(claves), vacio, dtype=object)
+    resultado[grupo[primeros]] = unicos.take(valor[primeros])
+    return pd.Series(resultado, index=claves, name=columna)
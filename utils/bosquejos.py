@@ -0,0 +1,78 @@
+"""
+Bosquejos HyperLogLog para estimar cantidades de valores distintos.
+
+Cada celda del cubo guarda 2**p registros de un byte. La unión de varias
+celdas es el máximo registro a registro, así que los bosquejos se calculan por
+bloque o por partición y se combinan sin volver a leer los id, para cualquier
+combinación de filtros. El error relativo típico (una desviación estándar) es
+1.04 / sqrt(2**p).
+"""
+
+import numpy as np
+import pandas as pd
+
+PREFIJO = "hll_"
+
+
+def error_relativo(precision):
+    """Error relativo típico (una desviación estándar) de un bosquejo"""
+    return 1.04 / np.sqrt(2**precision)
+
+
+def columnas(precision):
+    """Nombres de las columnas de registros de una tabla de bosquejos"""
+    return [f"{PREFIJO}{i:04d}" for i in range(2**precision)]
+
+
+def columnas_registros(tabla):
+    """Columnas de registros de una tabla de bosquejos"""
+    return [c for c in tabla.columns if c.startswith(PREFIJO)]
+
+
+def _bits(valores):
+    # Cantidad de bits significativos de cada entero sin signo (0 para 0)
+    valores = valores.copy()
+    bits = np.zeros(len(valores), dtype=np.int64)
+    for salto in (32, 16, 8, 4, 2, 1):
+        mayores = valores >= (np.uint64(1) << np.uint64(salto))
+        bits[mayores] += salto
+        valores[mayores] >>= np.uint64(salto)
+    return bits + (valores > 0)
+
+
+def registros(ids, celdas, n_celdas, precision):
+    """
+    Registros HyperLogLog (n_celdas x 2**p, uint8) de los ids de cada celda.
+
+    `celdas` indica la celda (0..n_celdas-1) de cada id. El hash es
+    determinista, de modo que los registros de distintos procesos se combinan.
+    """
+    ids = np.asarray(ids)
+    if ids.dtype.kind == "f" and np.array_equal(ids, np.floor(ids)):
+        # Un bloque con id nulos los lee como flotantes: se hashean como enteros
+        # para que coincidan con los de los demás bloques
+        ids = ids.astype(np.int64)
+    h = pd.util.hash_array(ids)
+    ancho = 64 - precision
+    posicion = (h >> np.uint64(ancho)).astype(np.int64)
+    resto = h & np.uint64((1 << ancho) - 1)
+    rango = (ancho - _bits(resto) + 1).astype(np.uint8)
+
+    tamano = 2**precision
+    llaves = np.asarray(celdas, dtype=np.int64) * tamano + posicion
+    maximos = pd.Series(rango).groupby(llaves).max()
+    resultado = np.zeros(n_celdas * tamano, dtype=np.uint8)
+    resultado[maximos.index.to_numpy()] = maximos.to_numpy()
+    return resultado.reshape(n_celdas, tamano)
+
+
+def estimar(registros):
+    """Cantidad estimada de valores distintos de cada fila de registros"""
+    registros = np.atleast_2d(registros)
+    m = registros.shape[1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    crudo = alfa * m * m / np.exp2(-registros.astype(np.float64)).sum(axis=1)
+    # Con pocos valores se usa el conteo lineal de registros vacíos
+    vacios = (registros == 0).sum(axis=1)
+    lineal = m * np.log(m / np.maximum(vacios, 1))
+    return np.where((crudo <= 2.5 * m) & (vacios > 0), lineal, crudo)
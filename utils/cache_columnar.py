@@ -0,0 +1,268 @@
+import hashlib
+import io
+import json
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pandas.api.types import union_categoricals
+
+# Versión del formato de la caché: incrementarla cuando cambien las columnas derivadas
+VERSION_CACHE = 4
+CACHE_DIRNAME = ".cache"
+BLOQUE_HASH = 1024 * 1024
+# Bytes al final de lo ya ingerido que se verifican para detectar un CSV solo anexado
+BLOQUE_LIMITE = 64 * 1024
+
+# Columnas de texto que se leen como vistas sobre el archivo mapeado, sin copiarlas
+TIPOS_MAPEADOS = {pa.string(): pd.StringDtype("pyarrow")}
+
+
+class _Limitado(io.RawIOBase):
+    # Vista de solo lectura de un archivo que termina en la posición `fin`,
+    # aunque el archivo siga creciendo mientras se lee
+    def __init__(self, f, fin):
+        self._f = f
+        self._fin = fin
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        restantes = self._fin - self._f.tell()
+        if restantes <= 0:
+            return 0
+        with memoryview(destino) as vista:
+            return self._f.readinto(vista[: min(len(vista), restantes)])
+
+
+def hash_contenido(file_path, tamano=None):
+    """
+    Calcula el SHA-256 del contenido de un archivo leyéndolo por bloques
+    (solo los primeros `tamano` bytes, si se indica)
+    """
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        if tamano is not None:
+            f = _Limitado(f, tamano)
+        for bloque in iter(lambda: f.read(BLOQUE_HASH), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _hash_rango(f, inicio, fin):
+    f.seek(inicio)
+    return hashlib.sha256(f.read(fin - inicio)).hexdigest()
+
+
+def estado_ingesta(file_path, tamano=None):
+    """
+    Huella de los primeros `tamano` bytes ingeridos del archivo: tamaño, hash
+    de la cabecera y hash del último bloque antes de ese límite.
+    """
+    if tamano is None:
+        tamano = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        return {
+            "tamano": tamano,
+            "hash_cabeza": _hash_rango(f, 0, min(tamano, BLOQUE_HASH)),
+            "hash_limite": _hash_rango(f, max(0, tamano - BLOQUE_LIMITE), tamano),
+        }
+
+
+def es_anexo(file_path, estado):
+    """
+    Indica si el archivo solo creció al final desde `estado`: el prefijo ya
+    ingerido conserva sus hashes y terminaba en un salto de línea.
+    """
+    if not estado:
+        return False
+    tamano_previo = estado["tamano"]
+    if tamano_previo == 0 or os.path.getsize(file_path) <= tamano_previo:
+        return False
+
+    with open(file_path, "rb") as f:
+        f.seek(tamano_previo - 1)
+        if f.read(1) != b"\n":
+            return False
+        cabeza = _hash_rango(f, 0, min(tamano_previo, BLOQUE_HASH))
+        limite = _hash_rango(f, max(0, tamano_previo - BLOQUE_LIMITE), tamano_previo)
+    return cabeza == estado.get("hash_cabeza") and limite == estado.get("hash_limite")
+
+
+@contextmanager
+def abrir_csv(file_path, desde_byte=0, hasta_byte=None):
+    """
+    Abre el CSV posicionado en `desde_byte`, terminando en `hasta_byte` si se
+    indica (lo que se anexe después no se lee).
+
+    Retorna el archivo y los argumentos adicionales para pd.read_csv: al leer
+    desde la mitad del archivo se usan los nombres de columna de la cabecera.
+    """
+    with open(file_path, "rb") as f:
+        opciones = {}
+        if desde_byte:
+            columnas = list(pd.read_csv(f, nrows=0).columns)
+            f.seek(desde_byte)
+            opciones = {"header": None, "names": columnas}
+        if hasta_byte is not None:
+            f = io.BufferedReader(_Limitado(f, hasta_byte))
+        yield f, opciones
+
+
+def concatenar(df, cola):
+    """Agrega filas al final conservando las columnas categóricas"""
+    cola = cola.set_axis(pd.RangeIndex(len(df), len(df) + len(cola)))
+    for col in df.columns.intersection(cola.columns):
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and isinstance(
+            cola[col].dtype, pd.CategoricalDtype
+        ):
+            union = union_categoricals([df[col], cola[col]])
+            df[col] = df[col].cat.set_categories(union.categories)
+            cola[col] = cola[col].cat.set_categories(union.categories)
+    combinado = pd.concat([df, cola])
+    combinado.attrs = df.attrs
+    return combinado
+
+
+def rutas_cache(file_path):
+    """Retorna las rutas del archivo Feather y de sus metadatos para un CSV"""
+    directorio = os.path.join(
+        os.path.dirname(os.path.abspath(file_path)), CACHE_DIRNAME
+    )
+    nombre = os.path.splitext(os.path.basename(file_path))[0]
+    return (
+        os.path.join(directorio, f"{nombre}.feather"),
+        os.path.join(directorio, f"{nombre}.json"),
+    )
+
+
+def _leer_meta(ruta_meta):
+    if not os.path.exists(ruta_meta):
+        return None
+    try:
+        with open(ruta_meta, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return None
+
+
+def _guardar_meta(ruta_meta, meta):
+    tmp = f"{ruta_meta}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=4)
+    os.replace(tmp, ruta_meta)
+
+
+def _leer_cache(ruta_datos, meta):
+    # La caché se guarda sin comprimir y se mapea en memoria de solo lectura:
+    # las columnas numéricas, de fecha y de texto apuntan a las páginas del
+    # archivo, compartidas por todas las sesiones y procesos que lo abren
+    tabla = feather.read_table(ruta_datos, memory_map=True)
+    df = tabla.to_pandas(
+        split_blocks=True, self_destruct=True, types_mapper=TIPOS_MAPEADOS.get
+    )
+    df.attrs.update(meta.get("attrs", {}))
+    return df
+
+
+def cache_vigente(file_path):
+    """
+    Retorna los metadatos de la caché si corresponde al archivo actual, o None.
+
+    Compara primero tamaño y fecha de modificación; si solo cambió la fecha,
+    confirma con el hash del contenido antes de invalidar.
+    """
+    ruta_datos, ruta_meta = rutas_cache(file_path)
+    meta = _leer_meta(ruta_meta)
+    if (
+        not meta
+        or meta.get("version") != VERSION_CACHE
+        or not os.path.exists(ruta_datos)
+    ):
+        return None
+
+    stat = os.stat(file_path)
+    if meta["tamano"] != stat.st_size:
+        return None
+    if meta["mtime"] == stat.st_mtime_ns:
+        return meta
+
+    if meta["sha256"] != hash_contenido(file_path):
+        return None
+    # El contenido es el mismo (p. ej. el archivo se copió de nuevo): refrescar la fecha
+    meta["mtime"] = stat.st_mtime_ns
+    try:
+        _guardar_meta(ruta_meta, meta)
+    except OSError:
+        pass
+    return meta
+
+
+def cargar_con_cache(file_path, parser, combinar=concatenar):
+    """
+    Carga un CSV desde su caché columnar (Feather mapeado en memoria),
+    actualizándola si el CSV cambió.
+
+    Si el CSV solo recibió filas nuevas al final, se interpretan únicamente esos
+    bytes y se agregan a la caché; ante cualquier otro cambio se reconstruye.
+    Se lee hasta el tamaño que tenía el archivo al empezar: lo que se anexe
+    durante la lectura queda para la próxima carga, que lo toma como anexo.
+
+    Args:
+        file_path: Ruta del CSV de origen
+        parser: Función (ruta, desde_byte=0, hasta_byte=None) que retorna el
+            DataFrame ya procesado de los bytes [desde_byte, hasta_byte)
+        combinar: Función (df_cache, df_nuevas_filas) que los une
+    """
+    ruta_datos, ruta_meta = rutas_cache(file_path)
+
+    meta = cache_vigente(file_path)
+    if meta is not None:
+        try:
+            return _leer_cache(ruta_datos, meta)
+        except Exception:
+            pass  # Caché corrupta o ilegible: se reconstruye
+
+    stat = os.stat(file_path)
+    df = None
+    meta_previa = _leer_meta(ruta_meta)
+    if (
+        meta_previa
+        and meta_previa.get("version") == VERSION_CACHE
+        and os.path.exists(ruta_datos)
+        and es_anexo(file_path, meta_previa)
+    ):
+        try:
+            previo = _leer_cache(ruta_datos, meta_previa)
+            nuevas = parser(
+                file_path, desde_byte=meta_previa["tamano"], hasta_byte=stat.st_size
+            )
+            df = combinar(previo, nuevas)
+        except Exception:
+            df = None  # Se reconstruye desde cero
+
+    if df is None:
+        df = parser(file_path, hasta_byte=stat.st_size)
+
+    meta = {
+        "version": VERSION_CACHE,
+        **estado_ingesta(file_path, stat.st_size),
+        "mtime": stat.st_mtime_ns,
+        "sha256": hash_contenido(file_path, stat.st_size),
+        "filas": len(df),
+        "attrs": df.attrs,
+    }
+    try:
+        os.makedirs(os.path.dirname(ruta_datos), exist_ok=True)
+        tmp = f"{ruta_datos}.tmp"
+        df.to_feather(tmp, compression="uncompressed")
+        os.replace(tmp, ruta_datos)
+        _guardar_meta(ruta_meta, meta)
+        # Se retorna la versión mapeada y se libera la recién interpretada
+        return _leer_cache(ruta_datos, meta)
+    except Exception:
+        # Sin permisos de escritura: se sigue trabajando sin caché
+        return df
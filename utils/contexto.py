@@ -0,0 +1,117 @@
+"""
+Contexto de análisis que comparten los módulos del proyecto de conflicto armado.
+
+Para cada origen del hecho se calculan una sola vez (por versión del cubo)
+las rebanadas por año y los totales anuales y mensuales (con su parte de
+desplazamiento) que muestran varios módulos; `run` pasa el mismo contexto a
+cada `render()`.
+
+Cada módulo guarda además en el contexto las tablas que calcula (`resultados`),
+así que volver a un origen ya visitado no repite ninguna agregación.
+
+En modo aproximado las declaraciones únicas se estiman con los bosquejos
+HyperLogLog del cubo; el contexto exacto del mismo origen se guarda aparte.
+Los grupos de edad configurados también forman parte del contexto.
+"""
+
+from utils.agregados import (
+    BINS_EDAD,
+    ETIQUETAS_EDAD,
+    distribucion_edad,
+    error_aproximado,
+    filtrar_origen,
+    media_edad,
+    por_ano,
+    resumen_mensual,
+    total,
+    valores_distintos,
+)
+
+
+def construir_contexto(cubo, origen, anos, aproximado=False, grupos_edad=None):
+    """
+    Calcula el contexto de un origen para los años dados.
+
+    `grupos_edad` es un dict con "limites" y "etiquetas" (por defecto
+    BINS_EDAD y ETIQUETAS_EDAD).
+    """
+    cubo_origen = filtrar_origen(cubo, origen)
+    cubos_ano = {ano: por_ano(cubo_origen, ano) for ano in anos}
+
+    # Totales y tabla mensual de todos los años en una sola agrupación
+    mensual, anual = resumen_mensual(cubo_origen, aproximado)
+    totales = anual.reindex(anos, fill_value=0).to_dict("index")
+
+    return {
+        "origen": origen,
+        "anos": list(anos),
+        "cubo": cubo_origen,
+        "por_ano": cubos_ano,
+        "totales": totales,
+        "mensual": mensual,
+        "grupos_edad": {
+            "limites": list((grupos_edad or {}).get("limites", BINS_EDAD)),
+            "etiquetas": list((grupos_edad or {}).get("etiquetas", ETIQUETAS_EDAD)),
+        },
+        # Error relativo típico de las declaraciones estimadas (None si exactas)
+        "error": (
+            {
+                "declaraciones": error_aproximado("bosquejos"),
+                "ubicaciones": error_aproximado("bosquejos_ubicacion"),
+            }
+            if aproximado
+            else None
+        ),
+        "resumen": {
+            "personas": total(cubo_origen["hechos_mes"]),
+            "ubicaciones": valores_distintos(
+                cubo_origen["hechos_ubicacion"], "ubicacion"
+            ),
+            "grupos": valores_distintos(
+                cubo_origen["hechos_responsable"], "presunto_responsable"
+            ),
+            "hechos": valores_distintos(
+                cubo_origen["hechos_mes"], "hecho_victimizante"
+            ),
+            "edad_promedio": media_edad(distribucion_edad(cubo_origen["edades"])),
+        },
+    }
+
+
+def contexto_analisis(cubo, origen, anos, aproximado=False, grupos_edad=None):
+    """
+    Retorna el contexto de un origen, calculándolo solo la primera vez.
+
+    Los contextos se guardan en el propio cubo, de modo que se comparten entre
+    sesiones y se descartan junto con él cuando cambian los datos.
+    """
+    contextos = cubo.setdefault("contextos", {})
+    clave = (
+        origen,
+        tuple(anos),
+        aproximado,
+        tuple((k, tuple(v)) for k, v in sorted((grupos_edad or {}).items())),
+    )
+    if clave not in contextos:
+        contextos[clave] = construir_contexto(
+            cubo, origen, anos, aproximado, grupos_edad
+        )
+    return contextos[clave]
+
+
+def resultados(contexto, modulo, calcular):
+    """
+    Retorna las tablas de un módulo para el contexto, calculándolas una vez.
+
+    Args:
+        contexto: Contexto de análisis del origen seleccionado
+        modulo: Nombre del módulo que identifica sus resultados
+        calcular: Función (contexto) que construye las tablas del módulo
+
+    Como el contexto vive en el cubo, la memoria queda indexada por versión
+    de los datos, origen y módulo. Las tablas retornadas no deben modificarse.
+    """
+    memoria = contexto.setdefault("resultados", {})
+    if modulo not in memoria:
+        memoria[modulo] = calcular(contexto)
+    return memoria[modulo]
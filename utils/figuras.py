@@ -0,0 +1,109 @@
+"""
+Caché de figuras de Plotly compartida por todas las sesiones del proceso.
+
+Una figura se identifica por la función que la construye, un hash de los datos
+agregados que grafica y sus parámetros de diseño. Se guarda serializada en JSON
+y, en los aciertos, se reconstruye sin volver a validarla, que es lo que más
+tarda al crear figuras con plotly. La caché guarda como máximo FIGURAS_MAX
+figuras y descarta las usadas hace más tiempo (LRU).
+
+El límite se configura con la variable de entorno FIGURAS_CACHE_MAX.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+
+FIGURAS_MAX = int(os.environ.get("FIGURAS_CACHE_MAX", 256))
+
+_figuras = OrderedDict()
+_bloqueo = threading.Lock()
+_estadisticas = {"aciertos": 0, "fallos": 0}
+
+
+def _actualizar_hash(h, valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        h.update(repr((type(valor).__name__, valor.shape)).encode())
+        if isinstance(valor, pd.DataFrame):
+            h.update(repr(list(valor.columns)).encode())
+            h.update(repr([str(t) for t in valor.dtypes]).encode())
+        else:
+            h.update(repr((valor.name, str(valor.dtype))).encode())
+        h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+    elif isinstance(valor, dict):
+        h.update(b"{")
+        for llave in sorted(valor, key=repr):
+            _actualizar_hash(h, llave)
+            _actualizar_hash(h, valor[llave])
+        h.update(b"}")
+    elif isinstance(valor, (list, tuple)):
+        h.update(b"[")
+        for elemento in valor:
+            _actualizar_hash(h, elemento)
+        h.update(b"]")
+    else:
+        h.update(repr(valor).encode())
+
+
+def huella(*partes):
+    """Hash de datos agregados (DataFrame, Series, dict, listas) y parámetros"""
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        _actualizar_hash(h, parte)
+    return h.hexdigest()
+
+
+def figura(construir, *datos, **parametros):
+    """
+    Retorna `construir(*datos, **parametros)`, desde la caché si ya se
+    construyó con los mismos datos y parámetros.
+
+    `construir` debe ser una función con nombre (no una lambda), porque su
+    nombre forma parte de la clave. Cada llamada retorna una figura nueva, que
+    se puede modificar sin afectar a la caché.
+    """
+    llave = (
+        f"{construir.__module__}.{construir.__qualname__}",
+        huella(datos, parametros),
+    )
+
+    with _bloqueo:
+        serializada = _figuras.get(llave)
+        if serializada is not None:
+            _figuras.move_to_end(llave)
+            _estadisticas["aciertos"] += 1
+
+    if serializada is None:
+        fig = construir(*datos, **parametros)
+        serializada = fig.to_json()
+        with _bloqueo:
+            _estadisticas["fallos"] += 1
+            _figuras[llave] = serializada
+            _figuras.move_to_end(llave)
+            while len(_figuras) > FIGURAS_MAX:
+                _figuras.popitem(last=False)
+        return fig
+
+    # La figura ya se validó al construirla la primera vez
+    return go.Figure(json.loads(serializada), _validate=False)
+
+
+def estadisticas():
+    """Aciertos, fallos y figuras guardadas en la caché"""
+    with _bloqueo:
+        return {
+            **_estadisticas,
+            "figuras": len(_figuras),
+            "memoria_mb": round(sum(len(s) for s in _figuras.values()) / 1024**2, 1),
+        }
+
+
+def limpiar():
+    """Descarta todas las figuras guardadas"""
+    with _bloqueo:
+        _figuras.clear()
@@ -0,0 +1,125 @@
+"""
+Índice invertido para filtrar un DataFrame por igualdad en varias columnas.
+
+Para cada columna indexada se guardan, por valor, las posiciones (ordenadas) de
+las filas que lo tienen. Una combinación de filtros es la intersección de esas
+listas, empezando por la más corta, así que su costo depende de las filas que
+coinciden y no del tamaño de la tabla. El índice se construye una vez por
+DataFrame (por versión de los datos) y guarda el resultado de las últimas
+RESULTADOS_MAX combinaciones de filtros.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+RESULTADOS_MAX = 128
+
+# Índices ya construidos, por DataFrame y columnas (ver `indice_invertido`)
+_indices = {}
+
+
+def construir_indice(df, columnas):
+    """Posiciones de las filas de cada valor no nulo de las columnas dadas"""
+    indice = {
+        "filas": len(df),
+        "columnas": {},
+        "resultados": OrderedDict(),
+        "bloqueo": threading.Lock(),
+    }
+    for columna in columnas:
+        codigos, valores = pd.factorize(df[columna])
+        validas = np.flatnonzero(codigos >= 0)
+        # Orden estable: las posiciones de cada valor quedan crecientes
+        orden = validas[np.argsort(codigos[validas], kind="stable")]
+        limites = np.zeros(len(valores) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(codigos[validas], minlength=len(valores)), out=limites[1:]
+        )
+        indice["columnas"][columna] = {
+            "valores": {valor: i for i, valor in enumerate(valores)},
+            "orden": orden,
+            "limites": limites,
+        }
+    return indice
+
+
+def indice_invertido(df, columnas):
+    """
+    Retorna el índice de las columnas de `df`, construyéndolo solo la primera
+    vez. El índice se descarta cuando el DataFrame deja de existir.
+    """
+    llave = (id(df), tuple(columnas))
+    entrada = _indices.get(llave)
+    if entrada is not None and entrada[0]() is df:
+        return entrada[1]
+    indice = construir_indice(df, columnas)
+    referencia = weakref.ref(df, lambda _, llave=llave: _indices.pop(llave, None))
+    _indices[llave] = (referencia, indice)
+    return indice
+
+
+def valores(indice, columna):
+    """Valores no nulos distintos de una columna indexada"""
+    return list(indice["columnas"][columna]["valores"])
+
+
+def _posiciones_valor(indice, columna, valor):
+    datos = indice["columnas"][columna]
+    i = datos["valores"].get(valor)
+    if i is None:
+        return datos["orden"][:0]
+    return datos["orden"][datos["limites"][i] : datos["limites"][i + 1]]
+
+
+def _interseccion(menor, mayor):
+    # Búsqueda binaria de cada posición de la lista menor en la mayor
+    if not len(menor) or not len(mayor):
+        return menor[:0]
+    lugares = np.minimum(np.searchsorted(mayor, menor), len(mayor) - 1)
+    return menor[mayor[lugares] == menor]
+
+
+def posiciones(indice, **filtros):
+    """
+    Posiciones crecientes de las filas que cumplen las igualdades
+    (columna=valor), o None si no hay filtros.
+    """
+    if not filtros:
+        return None
+    clave = tuple(sorted(filtros.items()))
+    with indice["bloqueo"]:
+        resultado = indice["resultados"].get(clave)
+        if resultado is not None:
+            indice["resultados"].move_to_end(clave)
+            return resultado
+
+    listas = sorted(
+        (
+            _posiciones_valor(indice, columna, valor)
+            for columna, valor in filtros.items()
+        ),
+        key=len,
+    )
+    resultado = listas[0]
+    for lista in listas[1:]:
+        resultado = _interseccion(resultado, lista)
+    resultado.flags.writeable = False
+
+    with indice["bloqueo"]:
+        indice["resultados"][clave] = resultado
+        while len(indice["resultados"]) > RESULTADOS_MAX:
+            indice["resultados"].popitem(last=False)
+    return resultado
+
+
+def filtrar(df, indice, **filtros):
+    """
+    Filas de `df` que cumplen las igualdades, en su orden original (como una
+    cadena de filtros booleanos). Sin filtros retorna el mismo `df`.
+    """
+    seleccion = posiciones(indice, **filtros)
+    return df if seleccion is None else df.take(seleccion)
@@ -0,0 +1,45 @@
+"""
+Datos particionados: un directorio con un CSV por año o por mes.
+
+El año (y el mes, si lo hay) se toma del nombre del archivo, p. ej.
+`2024.csv`, `2025-03.csv`, `datos_2024_11.csv` o `ano=2024.csv`. Los archivos
+sin año en el nombre se leen siempre, porque no se pueden descartar.
+"""
+
+import os
+import re
+
+PATRON_PARTICION = re.compile(
+    r"(?<!\d)(?P<ano>(?:19|20)\d{2})(?:[-_]?(?P<mes>\d{2}))?(?!\d)"
+)
+
+
+def ano_particion(nombre):
+    """Año de una partición según su nombre de archivo, o None si no lo indica"""
+    coincidencia = PATRON_PARTICION.search(os.path.splitext(nombre)[0])
+    return int(coincidencia["ano"]) if coincidencia else None
+
+
+def listar_particiones(directorio, anos=None):
+    """
+    Rutas de los CSV del directorio, ordenadas por nombre.
+
+    Con `anos` solo se incluyen las particiones de esos años (y las que no
+    indican año).
+    """
+    rutas = []
+    for nombre in sorted(os.listdir(directorio)):
+        if not nombre.lower().endswith(".csv"):
+            continue
+        ano = ano_particion(nombre)
+        if anos is not None and ano is not None and ano not in anos:
+            continue
+        rutas.append(os.path.join(directorio, nombre))
+    return rutas
+
+
+def tamano_datos(ruta):
+    """Tamaño en bytes de un CSV o de todas las particiones de un directorio"""
+    if os.path.isdir(ruta):
+        return sum(os.path.getsize(p) for p in listar_particiones(ruta))
+    return os.path.getsize(ruta)
@@ -0,0 +1,133 @@
+"""
+Registro de datasets compartido por todos los proyectos del proceso.
+
+Cada dataset se guarda bajo una clave y la ruta de su archivo de origen, junto
+con la firma del archivo (tamaño y fecha de modificación): si el archivo
+cambia, la siguiente consulta lo vuelve a cargar. La memoria total está
+limitada por un presupuesto; al superarlo se descartan los datasets usados
+hace más tiempo (LRU).
+
+El presupuesto se configura con la variable de entorno PRESUPUESTO_MEMORIA_MB
+o con `configurar_presupuesto`.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+PRESUPUESTO_MB = float(os.environ.get("PRESUPUESTO_MEMORIA_MB", 2048))
+
+_entradas = OrderedDict()
+_bloqueo = threading.Lock()
+_bloqueos_carga = {}
+_estadisticas = {"aciertos": 0, "fallos": 0, "desalojos": 0}
+
+
+def firma_archivo(file_path):
+    """
+    Tamaño y fecha de modificación (ns) del archivo; para un directorio,
+    la de cada archivo que contiene.
+    """
+    if os.path.isdir(file_path):
+        return tuple(
+            (nombre, *firma_archivo(os.path.join(file_path, nombre)))
+            for nombre in sorted(os.listdir(file_path))
+            if os.path.isfile(os.path.join(file_path, nombre))
+        )
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def tamano_mb(valor):
+    """Memoria aproximada de un DataFrame, Series o dict de ellos, en MB"""
+    if isinstance(valor, pd.DataFrame):
+        return valor.memory_usage(deep=True).sum() / 1024**2
+    if isinstance(valor, pd.Series):
+        return valor.memory_usage(deep=True) / 1024**2
+    if isinstance(valor, dict):
+        return sum(tamano_mb(v) for v in valor.values())
+    return 0.0
+
+
+def configurar_presupuesto(presupuesto_mb):
+    """Cambia el presupuesto de memoria y desaloja lo que lo exceda"""
+    global PRESUPUESTO_MB
+    with _bloqueo:
+        PRESUPUESTO_MB = float(presupuesto_mb)
+        _desalojar()
+
+
+def _desalojar(conservar=None):
+    # Se descarta desde el menos usado recientemente; la entrada recién
+    # cargada se conserva aunque por sí sola supere el presupuesto
+    while sum(e["memoria_mb"] for e in _entradas.values()) > PRESUPUESTO_MB:
+        llave = next((k for k in _entradas if k != conservar), None)
+        if llave is None:
+            break
+        del _entradas[llave]
+        _estadisticas["desalojos"] += 1
+
+
+def obtener(clave, file_path, cargar):
+    """
+    Retorna el dataset registrado para (clave, archivo), cargándolo si hace falta.
+
+    Args:
+        clave: Nombre del dataset (p. ej. "conflicto_armado.datos")
+        file_path: Archivo de origen cuya firma invalida el dataset
+        cargar: Función (previo) que construye el dataset; `previo` es la
+            versión anterior si el archivo cambió y seguía registrada, o None
+
+    El valor retornado es compartido: no debe modificarse.
+    """
+    llave = (clave, os.path.abspath(file_path))
+    firma = firma_archivo(file_path)
+
+    with _bloqueo:
+        entrada = _entradas.get(llave)
+        if entrada is not None and entrada["firma"] == firma:
+            _entradas.move_to_end(llave)
+            _estadisticas["aciertos"] += 1
+            return entrada["valor"]
+        bloqueo_carga = _bloqueos_carga.setdefault(llave, threading.Lock())
+
+    # Una sola carga por dataset: las demás sesiones esperan su resultado
+    with bloqueo_carga:
+        with _bloqueo:
+            entrada = _entradas.get(llave)
+            if entrada is not None and entrada["firma"] == firma:
+                _entradas.move_to_end(llave)
+                _estadisticas["aciertos"] += 1
+                return entrada["valor"]
+
+        valor = cargar(entrada["valor"] if entrada is not None else None)
+
+        with _bloqueo:
+            _estadisticas["fallos"] += 1
+            _entradas[llave] = {
+                "firma": firma,
+                "valor": valor,
+                "memoria_mb": tamano_mb(valor),
+            }
+            _entradas.move_to_end(llave)
+            _desalojar(conservar=llave)
+    return valor
+
+
+def estadisticas():
+    """Aciertos, fallos, desalojos y memoria ocupada del registro"""
+    with _bloqueo:
+        return {
+            **_estadisticas,
+            "entradas": len(_entradas),
+            "memoria_mb": round(sum(e["memoria_mb"] for e in _entradas.values()), 1),
+            "presupuesto_mb": PRESUPUESTO_MB,
+        }
+
+
+def limpiar():
+    """Descarta todos los datasets registrados"""
+    with _bloqueo:
+        _entradas.clear()